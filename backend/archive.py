@@ -0,0 +1,309 @@
+import argparse
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    Text,
+    bindparam,
+    event,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import DATABASE_URL, engine, sqlite_path
+
+# Completed tasks that have not been touched for a while are moved into a
+# second SQLite file that is ATTACHed to every connection under this name.
+# The live `tasks` table stays small while reports can still reach old data.
+ARCHIVE_SCHEMA = "archive"
+
+
+def path_for(db_path: str) -> str:
+    """Archive file that sits next to the SQLite database at ``db_path``."""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}_archive{ext or '.db'}"
+
+
+def _default_archive_path() -> str:
+    path = sqlite_path()
+    return path_for(path) if path else ""
+
+
+# set ARCHIVE_DB_PATH to an empty string to disable archiving entirely
+ARCHIVE_DB_PATH = os.getenv("ARCHIVE_DB_PATH", _default_archive_path())
+ENABLED = bool(ARCHIVE_DB_PATH) and DATABASE_URL.startswith("sqlite")
+
+DEFAULT_AGE_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "120"))
+DEFAULT_BATCH_SIZE = 500
+
+archive_metadata = MetaData(schema=ARCHIVE_SCHEMA)
+
+# same columns as models.Task / models.TaskTag; SQLite cannot enforce foreign
+# keys across attached databases so none are declared here
+tasks = Table(
+    "tasks",
+    archive_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("title", String(255), nullable=False),
+    Column("details", Text),
+    Column("hours_spent", Numeric(6, 2)),
+    Column("due_date", Date),
+    Column("blockers", Text),
+    Column("comments", Text),
+    Column("status", String(50)),
+    Column("assignee_id", Integer),
+    Column("creator_id", Integer),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+    Index("ix_archive_tasks_created_at", "created_at"),
+    Index("ix_archive_tasks_assignee_id", "assignee_id"),
+)
+
+task_tags = Table(
+    "task_tags",
+    archive_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("task_id", Integer, nullable=False),
+    Column("member_id", Integer, nullable=False),
+    Column("created_at", DateTime),
+    Index("ix_archive_task_tags_task_id", "task_id"),
+    Index("ix_archive_task_tags_member_id", "member_id"),
+)
+
+TASK_COLUMNS = [c.name for c in tasks.columns]
+TAG_COLUMNS = [c.name for c in task_tags.columns]
+
+
+def install(target_engine, path: str = ARCHIVE_DB_PATH):
+    """Attach the archive file at ``path`` to every new connection of ``target_engine``."""
+    if not ENABLED:
+        return
+
+    def attach(dbapi_connection, connection_record):
+        dbapi_connection.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+
+    event.listen(target_engine, "connect", attach)
+
+
+install(engine)
+
+
+def create_all(bind=engine):
+    if ENABLED:
+        archive_metadata.create_all(bind=bind)
+
+
+def _copy(table: str, columns: List[str], key: str, src: str, dst: str):
+    cols = ", ".join(columns)
+    return text(
+        f"INSERT INTO {dst}.{table} ({cols}) SELECT {cols} FROM {src}.{table} WHERE {key} IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+
+
+def _delete(table: str, key: str, schema: str):
+    return text(f"DELETE FROM {schema}.{table} WHERE {key} IN :ids").bindparams(
+        bindparam("ids", expanding=True)
+    )
+
+
+def _split_commits(db: Session) -> bool:
+    # SQLite only commits a transaction across attached files atomically with
+    # a rollback journal; in WAL mode (READ_ENGINE=wal) each file commits on
+    # its own, so a crash could keep one file's half of a move and lose the other
+    return db.execute(text("PRAGMA main.journal_mode")).scalar() == "wal"
+
+
+def _bump_generation(db: Session):
+    # every move changes the archive's user_version, so a reader that copies
+    # the main and archive files one after the other (replica.refresh_copy)
+    # can tell whether a batch moved in between. Must run after the batch's
+    # first write: pysqlite only opens the transaction on DML.
+    version = db.execute(text(f"PRAGMA {ARCHIVE_SCHEMA}.user_version")).scalar()
+    db.execute(text(f"PRAGMA {ARCHIVE_SCHEMA}.user_version = {int(version) + 1}"))
+
+
+def generation(path: str) -> int:
+    """The archive file's move counter (see _bump_generation)."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _move(db: Session, ids: List[int], src: str, dst: str):
+    # with a rollback journal tasks and their tags move in one transaction, so
+    # a crash mid-batch never leaves a task split across both files. In WAL
+    # mode the copy is committed before the delete: a crash then leaves at
+    # worst the batch in both files (cleaned up by _drop_duplicates), never
+    # in neither. Readers may see such a batch twice for that moment.
+    db.execute(_copy("tasks", TASK_COLUMNS, "id", src, dst), {"ids": ids})
+    db.execute(_copy("task_tags", TAG_COLUMNS, "task_id", src, dst), {"ids": ids})
+    if _split_commits(db):
+        _bump_generation(db)
+        db.commit()
+    db.execute(_delete("task_tags", "task_id", src), {"ids": ids})
+    db.execute(_delete("tasks", "id", src), {"ids": ids})
+    _bump_generation(db)
+    db.commit()
+
+
+def _drop_duplicates(db: Session):
+    """Finish moves that a crash left in both files (WAL mode only).
+
+    The live copy wins: it is the same as the archived one or newer, and a
+    task kept live by mistake is simply archived again by the next run.
+    """
+    ids = list(
+        db.execute(
+            text(f"SELECT id FROM {ARCHIVE_SCHEMA}.tasks WHERE id IN (SELECT id FROM main.tasks)")
+        ).scalars()
+    )
+    for i in range(0, len(ids), DEFAULT_BATCH_SIZE):
+        batch = ids[i : i + DEFAULT_BATCH_SIZE]
+        db.execute(_delete("task_tags", "task_id", ARCHIVE_SCHEMA), {"ids": batch})
+        db.execute(_delete("tasks", "id", ARCHIVE_SCHEMA), {"ids": batch})
+        _bump_generation(db)
+        db.commit()
+
+
+def archive_completed(
+    db: Session,
+    older_than_days: int = DEFAULT_AGE_DAYS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """Move completed tasks not updated for ``older_than_days`` into the archive.
+
+    Work is committed per batch so writers are only held up for one batch at a
+    time. Returns the number of tasks moved.
+    """
+    if not ENABLED:
+        return 0
+    if _split_commits(db):
+        _drop_duplicates(db)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    # the newest row always stays live: tasks.id has no AUTOINCREMENT, so SQLite
+    # would otherwise hand an archived id out again
+    newest_id = db.query(func.max(models.Task.id)).scalar()
+    moved = 0
+    while True:
+        ids = [
+            row[0]
+            for row in db.query(models.Task.id)
+            .filter(
+                models.Task.status == "completed",
+                models.Task.updated_at < cutoff,
+                models.Task.id != newest_id,
+            )
+            .order_by(models.Task.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            break
+        _move(db, ids, "main", ARCHIVE_SCHEMA)
+        moved += len(ids)
+    return moved
+
+
+def unarchive(
+    db: Session,
+    task_ids: Optional[Iterable[int]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """Move archived tasks (by id and/or created_at range) back into the live tables."""
+    if not ENABLED:
+        return 0
+    if _split_commits(db):
+        _drop_duplicates(db)
+    q = select(tasks.c.id).order_by(tasks.c.id)
+    if task_ids is not None:
+        q = q.where(tasks.c.id.in_(list(task_ids)))
+    if created_from is not None:
+        q = q.where(tasks.c.created_at >= created_from)
+    if created_to is not None:
+        q = q.where(tasks.c.created_at <= created_to)
+    ids = list(db.execute(q).scalars())
+    for i in range(0, len(ids), batch_size):
+        _move(db, ids[i : i + batch_size], ARCHIVE_SCHEMA, "main")
+    return len(ids)
+
+
+def covers(db: Session, start: datetime) -> bool:
+    """True when the archive may hold tasks created at or after ``start``.
+
+    A single MAX() over the created_at index, so callers can skip the archive
+    for the common case of recent date ranges.
+    """
+    if not ENABLED:
+        return False
+    newest = db.execute(select(func.max(tasks.c.created_at))).scalar()
+    return newest is not None and newest >= start
+
+
+def query_tasks(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    member_id: Optional[int] = None,
+    statuses: Optional[List[str]] = None,
+):
+    """Archived task rows, filtered the same way the live queries are."""
+    q = select(tasks).order_by(tasks.c.created_at.desc())
+    if start is not None:
+        q = q.where(tasks.c.created_at >= start)
+    if end is not None:
+        q = q.where(tasks.c.created_at <= end)
+    if member_id:
+        q = q.where(tasks.c.assignee_id == member_id)
+    if statuses:
+        q = q.where(tasks.c.status.in_(statuses))
+    return db.execute(q).all()
+
+
+def main(argv=None):
+    from .db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Move old completed tasks in or out of the archive database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    arc = sub.add_parser("archive", help="archive completed tasks")
+    arc.add_argument("--older-than-days", type=int, default=DEFAULT_AGE_DAYS)
+    arc.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    un = sub.add_parser("unarchive", help="restore archived tasks")
+    un.add_argument("--task-id", type=int, action="append", dest="task_ids")
+    un.add_argument("--created-from", type=datetime.fromisoformat)
+    un.add_argument("--created-to", type=datetime.fromisoformat)
+    args = parser.parse_args(argv)
+
+    if not ENABLED:
+        parser.error("archiving requires a SQLite DATABASE_URL and ARCHIVE_DB_PATH")
+    models.Base.metadata.create_all(bind=engine)
+    create_all()
+    with SessionLocal() as db:
+        if args.command == "archive":
+            moved = archive_completed(db, args.older_than_days, args.batch_size)
+            print(f"archived {moved} task(s) into {ARCHIVE_DB_PATH}")
+        else:
+            if not (args.task_ids or args.created_from or args.created_to):
+                parser.error("give --task-id and/or a --created-from/--created-to range")
+            moved = unarchive(db, args.task_ids, args.created_from, args.created_to)
+            print(f"restored {moved} task(s) from {ARCHIVE_DB_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from . import archive, bootstrap, shards
+from .db import sqlite_path
+
+# Online backups: every database file (main, archive, team shards) is copied
+# with the SQLite backup API a few pages at a time, sleeping between steps so
+# writers are only ever held up for one short step (in WAL mode not at all:
+# the copy reads one snapshot that writers keep appending past). Each
+# snapshot is a (microsecond) timestamped directory of gzipped, integrity-checked files plus
+# a manifest.json, and only the newest BACKUP_KEEP snapshots are kept.
+BACKUP_DIR = os.getenv(
+    "BACKUP_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "backups")
+)
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+BACKUP_PAGES = int(os.getenv("BACKUP_PAGES", "256"))
+BACKUP_PAUSE = float(os.getenv("BACKUP_PAUSE_MS", "10")) / 1000
+
+DB_PATH = sqlite_path()
+ENABLED = bool(DB_PATH)
+
+MANIFEST = "manifest.json"
+STAMP_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+# held while a snapshot is written, by whichever process (server or CLI) runs it
+LOCK_NAME = ".backup.lock"
+# the backup restarts whenever another connection writes to the source; after
+# this many restarts the step size grows, ending in a single-step copy
+MAX_RESTARTS = 3
+
+
+class BackupBusy(Exception):
+    pass
+
+
+class _Restarted(Exception):
+    pass
+
+
+def copy_database(src_path: str, dst_path: str, pages: int = BACKUP_PAGES, pause: float = BACKUP_PAUSE) -> dict:
+    """Copy the SQLite database at ``src_path`` to ``dst_path`` while it stays online.
+
+    Returns timing stats: total ``duration_ms``, ``locked_ms`` spent inside
+    backup steps (when writers may have to wait) and the longest single step,
+    ``max_step_ms``, which bounds the latency a backup can add to one write.
+    Both are 0 for a WAL database, where readers never block writers.
+    """
+    stats = {"steps": 0, "restarts": 0, "locked_ms": 0.0, "max_step_ms": 0.0}
+    started = time.perf_counter()
+    while True:
+        if stats["restarts"] >= MAX_RESTARTS * 3:
+            step_pages = -1
+        else:
+            step_pages = pages * 4 ** (stats["restarts"] // MAX_RESTARTS)
+        last = {"remaining": None, "at": time.perf_counter()}
+
+        def progress(status, remaining, total):
+            now = time.perf_counter()
+            step_ms = (now - last["at"]) * 1000
+            stats["steps"] += 1
+            stats["locked_ms"] += step_ms
+            stats["max_step_ms"] = max(stats["max_step_ms"], step_ms)
+            if last["remaining"] is not None and remaining > last["remaining"]:
+                raise _Restarted()
+            last["remaining"] = remaining
+            time.sleep(pause)
+            last["at"] = time.perf_counter()
+
+        src = sqlite3.connect(src_path, isolation_level=None)
+        dst = sqlite3.connect(dst_path)
+        try:
+            wal = src.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            if wal:
+                # pin one read snapshot for the whole copy; other connections'
+                # commits then neither restart the backup nor wait for it
+                src.execute("BEGIN")
+                src.execute("SELECT count(*) FROM sqlite_master").fetchone()
+            src.backup(dst, pages=step_pages, progress=progress)
+            if wal:
+                src.execute("COMMIT")
+                stats["locked_ms"] = stats["max_step_ms"] = 0.0
+            break
+        except _Restarted:
+            stats["restarts"] += 1
+        finally:
+            dst.close()
+            src.close()
+    stats["duration_ms"] = (time.perf_counter() - started) * 1000
+    return {k: round(v, 1) if isinstance(v, float) else v for k, v in stats.items()}
+
+
+def integrity_check(path: str) -> str:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _sources() -> Dict[str, str]:
+    """Snapshot-relative name -> live database file, for every file to back up."""
+    files = {"main.db": DB_PATH}
+    if archive.ENABLED and os.path.exists(archive.ARCHIVE_DB_PATH):
+        files["archive.db"] = archive.ARCHIVE_DB_PATH
+    if shards.ENABLED:
+        for team_id in shards.shard_team_ids():
+            path = shards.shard_path(team_id)
+            name = os.path.basename(path)
+            files[f"shards/{name}"] = path
+            if os.path.exists(archive.path_for(path)):
+                files[f"shards/{os.path.basename(archive.path_for(path))}"] = archive.path_for(path)
+    return files
+
+
+def snapshots(dest_dir: str = BACKUP_DIR) -> List[str]:
+    """Snapshot directories in ``dest_dir``, newest first."""
+    if not os.path.isdir(dest_dir):
+        return []
+    names = [
+        n
+        for n in os.listdir(dest_dir)
+        if not n.startswith(".") and os.path.exists(os.path.join(dest_dir, n, MANIFEST))
+    ]
+    return [os.path.join(dest_dir, n) for n in sorted(names, reverse=True)]
+
+
+def rotate(dest_dir: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> List[str]:
+    removed = snapshots(dest_dir)[keep:]
+    for path in removed:
+        shutil.rmtree(path, ignore_errors=True)
+    return removed
+
+
+def run(dest_dir: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> dict:
+    """Take a snapshot of every database file, then rotate old snapshots.
+
+    Raises BackupBusy if a backup into ``dest_dir`` is already running (in any
+    process) and RuntimeError if a copy fails its integrity check.
+    """
+    if not ENABLED:
+        raise RuntimeError("Backups require a SQLite database file")
+    os.makedirs(dest_dir, exist_ok=True)
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(bootstrap.file_lock(os.path.join(dest_dir, LOCK_NAME), blocking=False))
+        except BlockingIOError:
+            raise BackupBusy()
+        return _run_locked(dest_dir, keep)
+
+
+def _run_locked(dest_dir: str, keep: int) -> dict:
+    started = time.perf_counter()
+    stamp = datetime.utcnow().strftime(STAMP_FORMAT)
+    target = os.path.join(dest_dir, stamp)
+    tmp_dir = os.path.join(dest_dir, f".{stamp}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        manifest = {"snapshot": stamp, "files": {}}
+        for name, src in _sources().items():
+            raw = os.path.join(tmp_dir, name)
+            os.makedirs(os.path.dirname(raw), exist_ok=True)
+            stats = copy_database(src, raw)
+            check = integrity_check(raw)
+            if check != "ok":
+                raise RuntimeError(f"Integrity check failed for {name}: {check}")
+            # compress outside the backup steps; only the raw copy is read here
+            with open(raw, "rb") as fin, gzip.open(raw + ".gz", "wb", compresslevel=6) as fout:
+                shutil.copyfileobj(fin, fout, 1024 * 1024)
+            stats["bytes"] = os.path.getsize(raw)
+            stats["compressed_bytes"] = os.path.getsize(raw + ".gz")
+            os.remove(raw)
+            manifest["files"][name] = stats
+        files = manifest["files"].values()
+        manifest["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        manifest["max_write_stall_ms"] = max(f["max_step_ms"] for f in files)
+        manifest["locked_ms"] = round(sum(f["locked_ms"] for f in files), 1)
+        manifest["integrity"] = "ok"
+        with open(os.path.join(tmp_dir, MANIFEST), "w") as fh:
+            json.dump(manifest, fh, indent=2)
+        os.replace(tmp_dir, target)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    manifest["path"] = target
+    manifest["rotated"] = [os.path.basename(p) for p in rotate(dest_dir, keep)]
+    return manifest
+
+
+def restore(snapshot: str, db_path: str, shard_dir: Optional[str] = None, force: bool = False) -> List[str]:
+    """Unpack ``snapshot`` so that ``db_path`` (and its archive/shards) can be served.
+
+    Point DATABASE_URL (and SHARD_DIR) of a fresh instance at the result.
+    Refuses to overwrite existing files unless ``force`` is set.
+    """
+    with open(os.path.join(snapshot, MANIFEST)) as fh:
+        manifest = json.load(fh)
+    targets = {}
+    for name in manifest["files"]:
+        if name == "main.db":
+            targets[name] = db_path
+        elif name == "archive.db":
+            targets[name] = archive.path_for(db_path)
+        else:
+            if not shard_dir:
+                raise ValueError("Snapshot contains team shards; pass a shard directory")
+            targets[name] = os.path.join(shard_dir, os.path.basename(name))
+    existing = [p for p in targets.values() if os.path.exists(p)]
+    if existing and not force:
+        raise FileExistsError(f"Refusing to overwrite {', '.join(existing)}")
+
+    for name, path in targets.items():
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".restore.tmp"
+        with gzip.open(os.path.join(snapshot, name + ".gz"), "rb") as fin, open(tmp, "wb") as fout:
+            shutil.copyfileobj(fin, fout, 1024 * 1024)
+        check = integrity_check(tmp)
+        if check != "ok":
+            os.remove(tmp)
+            raise RuntimeError(f"Integrity check failed for {name}: {check}")
+        for suffix in ("-wal", "-shm", "-journal"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.replace(tmp, path)
+    return list(targets.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online backups of the effort tracker databases")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rp = sub.add_parser("run", help="take a snapshot now")
+    rp.add_argument("--dir", default=BACKUP_DIR)
+    rp.add_argument("--keep", type=int, default=BACKUP_KEEP)
+
+    lp = sub.add_parser("list", help="list snapshots, newest first")
+    lp.add_argument("--dir", default=BACKUP_DIR)
+
+    sp = sub.add_parser("restore", help="unpack a snapshot into a (fresh) database path")
+    sp.add_argument("snapshot", help="snapshot directory, or its name inside --dir")
+    sp.add_argument("--to", required=True, help="database file to create, e.g. /tmp/loadtest/effort.db")
+    sp.add_argument("--shard-dir", help="where to put team shards, if the snapshot has any")
+    sp.add_argument("--dir", default=BACKUP_DIR)
+    sp.add_argument("--force", action="store_true", help="overwrite existing files")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        try:
+            manifest = run(args.dir, args.keep)
+        except BackupBusy:
+            parser.error(f"a backup into {args.dir} is already running")
+        print(
+            f"{manifest['path']}: {len(manifest['files'])} file(s) in {manifest['duration_ms']} ms, "
+            f"longest write stall {manifest['max_write_stall_ms']} ms, integrity ok"
+        )
+        for name in manifest["rotated"]:
+            print(f"removed old snapshot {name}")
+    elif args.command == "list":
+        for path in snapshots(args.dir):
+            with open(os.path.join(path, MANIFEST)) as fh:
+                manifest = json.load(fh)
+            size = sum(f["compressed_bytes"] for f in manifest["files"].values())
+            print(f"{os.path.basename(path)}  {len(manifest['files'])} file(s)  {size} bytes")
+    else:
+        snapshot = args.snapshot if os.path.isdir(args.snapshot) else os.path.join(args.dir, args.snapshot)
+        try:
+            restored = restore(snapshot, args.to, args.shard_dir, args.force)
+        except (FileExistsError, ValueError) as e:
+            parser.error(str(e))
+        for path in restored:
+            print(f"restored {path}")
+        env = f"DATABASE_URL=sqlite:///{os.path.abspath(args.to)}"
+        if args.shard_dir:
+            env += f" SHARD_DIR={os.path.abspath(args.shard_dir)}"
+        print(f"start a fresh instance with {env}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from . import archive, models, replica, security, shards
+from .db import Base, SessionLocal, engine
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Schema creation and seeding must happen once per database, not once per
+# server process: concurrent create_all/seed/UPDATE runs race on the same
+# SQLite file. Every process takes this lock before bootstrapping.
+LOCK_PATH = os.getenv(
+    "BOOTSTRAP_LOCK_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), ".bootstrap.lock"),
+)
+# set by backend.serve in its workers after it has bootstrapped in the parent
+SKIP_ENV = "EFFORT_SKIP_BOOTSTRAP"
+
+
+@contextmanager
+def file_lock(path: str = LOCK_PATH, blocking: bool = True):
+    """Hold an exclusive lock on ``path`` across processes.
+
+    With ``blocking=False`` raises BlockingIOError if someone else holds it.
+    """
+    with open(path, "a+") as fh:
+        if fcntl:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif not blocking:
+            fh.seek(0)
+            try:
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+            except OSError:
+                raise BlockingIOError(path)
+        else:
+            # LK_LOCK gives up after ~10s, so keep retrying
+            while True:
+                try:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def run():
+    """Create tables and seed the standard teams and sample data (idempotent)."""
+    replica.prepare(engine)
+    Base.metadata.create_all(bind=engine)
+    models.ensure_indexes(engine, Base.metadata.sorted_tables)
+    archive.create_all()
+    shards.create_all()
+    with SessionLocal() as db:
+        # Ensure standard teams exist (OPS, DevOPS, Infra). Create any that are missing.
+        standard_names = ("OPS", "DevOPS", "Infra")
+        created_any = False
+        existing = {t.name for t in db.query(models.Team).all()}
+        teams_map = {}
+        for tname in standard_names:
+            team = db.query(models.Team).filter(models.Team.name == tname).first()
+            if not team:
+                team = models.Team(name=tname)
+                db.add(team)
+                db.flush()
+                created_any = True
+            teams_map[tname] = team
+
+        # If the DB was empty before, also seed a lead and sample members and task
+        if db.query(models.Team).count() == len(standard_names) and created_any:
+            lead = models.Member(
+                username="alex.lead",
+                password_hash=security.hash_password("changeme"),
+                name="Alex Lead",
+                career_level="Lead",
+                is_lead=True,
+                team_id=teams_map["OPS"].id,
+            )
+            member_a = models.Member(
+                username="bailey.dev",
+                password_hash=security.hash_password("changeme"),
+                name="Bailey Dev",
+                career_level="Senior",
+                team_id=teams_map["OPS"].id,
+            )
+            member_b = models.Member(
+                username="casey.analyst",
+                password_hash=security.hash_password("changeme"),
+                name="Casey Analyst",
+                career_level="Associate",
+                team_id=teams_map["OPS"].id,
+            )
+            db.add_all([lead, member_a, member_b])
+            db.flush()
+            # with SHARD_DIR the task belongs in member_a's team shard, listed in
+            # task_directory; otherwise this is just `db`
+            router = shards.TaskRouter(db)
+            task_db, task_id = router.for_new_task(member_a.id)
+            sample_task = models.Task(
+                id=task_id,
+                title="Onboard new feature",
+                details="Initial scaffolding and environment setup",
+                hours_spent=3.5,
+                due_date=datetime.utcnow().date() + timedelta(days=2),
+                comments="Need API keys",
+                assignee_id=member_a.id,
+                creator_id=lead.id,
+            )
+            task_db.add(sample_task)
+            task_db.commit()
+            db.commit()
+            router.close()
+
+        # Ensure all members are currently assigned to OPS (as requested).
+        # Not with shards: new tasks are placed by team, so this would send
+        # every one of them to the OPS shard after each restart.
+        ops = db.query(models.Team).filter(models.Team.name == 'OPS').first()
+        if ops and not shards.ENABLED:
+            db.query(models.Member).update({models.Member.team_id: ops.id})
+            db.commit()
+
+
+def run_locked():
+    with file_lock():
+        run()
+
+
+def warm():
+    """Per-process warm-up: open a pooled connection and load the bcrypt backend
+    so the first real request does not pay for either."""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    security.pwd_context.handler().get_backend()
+
+
+if __name__ == "__main__":
+    # used by backend.serve to bootstrap without importing the app itself
+    run_locked()
@@ -37,6 +37,9 @@ CREATE TABLE IF NOT EXISTS tasks (
     FOREIGN KEY(creator_id) REFERENCES members(id) ON DELETE SET NULL
 );
 
+CREATE INDEX IF NOT EXISTS ix_tasks_assignee_created ON tasks(assignee_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_tasks_created_at ON tasks(created_at);
+
 CREATE TABLE IF NOT EXISTS task_tags (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     task_id INTEGER NOT NULL,
@@ -47,6 +50,14 @@ CREATE TABLE IF NOT EXISTS task_tags (
     UNIQUE(task_id, member_id)
 );
 
+CREATE INDEX IF NOT EXISTS ix_task_tags_member_created ON task_tags(member_id, created_at);
+
+CREATE TABLE IF NOT EXISTS inbox_markers (
+    member_id INTEGER PRIMARY KEY,
+    seen_at DATETIME NOT NULL,
+    FOREIGN KEY(member_id) REFERENCES members(id) ON DELETE CASCADE
+);
+
 CREATE TABLE IF NOT EXISTS session_tokens (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     token TEXT UNIQUE NOT NULL,
@@ -56,3 +67,22 @@ CREATE TABLE IF NOT EXISTS session_tokens (
     FOREIGN KEY(member_id) REFERENCES members(id) ON DELETE CASCADE
 );
 
+
+CREATE TABLE IF NOT EXISTS export_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    format TEXT NOT NULL,
+    status TEXT DEFAULT 'queued',
+    progress INTEGER DEFAULT 0,
+    filename TEXT,
+    error TEXT,
+    requested_by INTEGER,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    finished_at DATETIME,
+    FOREIGN KEY(requested_by) REFERENCES members(id) ON DELETE SET NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_export_jobs_in_flight_key
+    ON export_jobs(key) WHERE status IN ('queued', 'running');
@@ -17,6 +17,15 @@ engine = create_engine(
     connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
 )
 
+
+def sqlite_path(url: str = DATABASE_URL) -> str:
+    """File behind a SQLite URL; empty for other databases and in-memory SQLite."""
+    if not url.startswith("sqlite") or "///" not in url:
+        return ""
+    path = url.split("///", 1)[1].split("?", 1)[0]
+    return "" if path == ":memory:" else path
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
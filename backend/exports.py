@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, replica, reporting
+from .db import SessionLocal
+from .shards import TaskRouter
+
+# Report exports that are too slow to build inside a request run here instead:
+# a job row is queued in `export_jobs`, a small local thread pool builds the
+# file into EXPORT_DIR, and clients poll the job until it can be downloaded.
+EXPORT_DIR = Path(
+    os.getenv("EXPORT_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "exports"))
+)
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+RETENTION = timedelta(hours=int(os.getenv("EXPORT_RETENTION_HOURS", "24")))
+MAX_ARTIFACTS = int(os.getenv("EXPORT_MAX_ARTIFACTS", "50"))
+# a job running for longer than this is assumed lost (e.g. the process died)
+STALE_AFTER = timedelta(minutes=int(os.getenv("EXPORT_JOB_TIMEOUT_MINUTES", "30")))
+# queued jobs may just be waiting for a free worker, so they get far longer;
+# this only catches jobs whose process died without shutting down
+QUEUED_STALE_AFTER = timedelta(hours=int(os.getenv("EXPORT_QUEUE_TIMEOUT_HOURS", "6")))
+
+IN_FLIGHT = ("queued", "running")
+
+_pool = None
+_pool_lock = threading.Lock()
+# ids of jobs handed to this process's pool that have not finished yet
+_owned = set()
+
+
+def _executor() -> ThreadPoolExecutor:
+    # created lazily so each forked server process gets its own threads
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+        return _pool
+
+
+def shutdown():
+    """Stop the pool and fail this process's unfinished jobs.
+
+    Left queued/running, they would keep answering identical requests (and
+    block new ones via the in-flight index) until STALE_AFTER.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        owned = list(_owned)
+        _owned.clear()
+    if not owned:
+        return
+    with SessionLocal() as db:
+        db.query(models.ExportJob).filter(
+            models.ExportJob.id.in_(owned), models.ExportJob.status.in_(IN_FLIGHT)
+        ).update(
+            {
+                models.ExportJob.status: "failed",
+                models.ExportJob.error: "Server shut down before the export finished",
+                models.ExportJob.finished_at: datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+
+
+def job_key(params: dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def _in_flight(db: Session, key: str) -> Optional[models.ExportJob]:
+    return (
+        db.query(models.ExportJob)
+        .filter(models.ExportJob.key == key, models.ExportJob.status.in_(IN_FLIGHT))
+        .first()
+    )
+
+
+def submit(db: Session, params: dict, requested_by: int) -> models.ExportJob:
+    """Queue an export, or return the identical export that is already in flight.
+
+    ``params`` must be fully resolved (concrete dates, effective member scope)
+    so that equal requests produce equal keys.
+    """
+    key = job_key(params)
+    expire_stale(db)
+    job = _in_flight(db, key)
+    if job:
+        return job
+
+    job = models.ExportJob(
+        key=key,
+        params=json.dumps(params, sort_keys=True),
+        format=params["format"],
+        requested_by=requested_by,
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # another server process queued the same export between our check and insert
+        db.rollback()
+        job = _in_flight(db, key)
+        if job:
+            return job
+        raise
+    db.refresh(job)
+    with _pool_lock:
+        _owned.add(job.id)
+    _executor().submit(_run, job.id)
+    return job
+
+
+class _Abandoned(Exception):
+    """The job was failed elsewhere (shutdown, timeout) while this build ran."""
+
+
+def _set_progress(job_id: int, expect: str = "running", **values) -> bool:
+    """Update the job if it is still in status ``expect``; False if it is not."""
+    # separate short session so progress commits don't expire the report's rows
+    with SessionLocal() as db:
+        updated = db.execute(
+            update(models.ExportJob)
+            .where(models.ExportJob.id == job_id, models.ExportJob.status == expect)
+            .values(**values)
+        ).rowcount
+        db.commit()
+    return updated == 1
+
+
+def _run(job_id: int):
+    try:
+        _build(job_id)
+    finally:
+        with _pool_lock:
+            _owned.discard(job_id)
+    with SessionLocal() as db:
+        prune(db)
+
+
+def _build(job_id: int):
+    with SessionLocal() as db:
+        job = db.get(models.ExportJob, job_id)
+        if job is None or not _set_progress(
+            job_id, expect="queued", status="running", progress=0, started_at=datetime.utcnow()
+        ):
+            return
+        params = json.loads(job.params)
+        reported = [0]
+
+        def stage(start: int, span: int):
+            # maps one phase's (done, total) onto its slice of 0-95%
+            def progress(done: int, total: int):
+                pct = start + (int(done * span / total) if total else 0)
+                if pct >= reported[0] + 5:
+                    reported[0] = pct
+                    if not _set_progress(job_id, progress=pct):
+                        raise _Abandoned()
+
+            return progress
+
+        read_db = replica.open_session()
+        try:
+            report = reporting.build(
+                TaskRouter(read_db),
+                date.fromisoformat(params["start_date"]),
+                date.fromisoformat(params["end_date"]),
+                params.get("member_id"),
+                params.get("status"),
+                progress=stage(0, 45),
+            )
+            if params["format"] == "xlsx":
+                data = reporting.to_xlsx(report["rows"], progress=stage(45, 50))
+            else:
+                data = reporting.to_csv(report["rows"]).encode()
+            EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+            name = f"{job_id}_{reporting.filename(report, params['format'])}"
+            tmp = EXPORT_DIR / f".{name}.tmp"
+            tmp.write_bytes(data)
+            os.replace(tmp, EXPORT_DIR / name)
+            if not _set_progress(
+                job_id, status="done", progress=100, filename=name, finished_at=datetime.utcnow()
+            ):
+                # already failed; an identical request may have a new job by now
+                (EXPORT_DIR / name).unlink(missing_ok=True)
+        except _Abandoned:
+            pass
+        except Exception as e:
+            _set_progress(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+        finally:
+            read_db.close()
+
+
+def artifact_path(job: models.ExportJob) -> Optional[Path]:
+    if job.status != "done" or not job.filename:
+        return None
+    path = EXPORT_DIR / job.filename
+    return path if path.exists() else None
+
+
+def expire_stale(db: Session):
+    now = datetime.utcnow()
+    # a running job is timed from when it started, not from time spent queued
+    started = func.coalesce(models.ExportJob.started_at, models.ExportJob.created_at)
+    db.query(models.ExportJob).filter(
+        or_(
+            and_(models.ExportJob.status == "running", started < now - STALE_AFTER),
+            and_(models.ExportJob.status == "queued", models.ExportJob.created_at < now - QUEUED_STALE_AFTER),
+        )
+    ).update(
+        {
+            models.ExportJob.status: "failed",
+            models.ExportJob.error: "Export timed out",
+            models.ExportJob.finished_at: now,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def prune(db: Session):
+    """Delete artifacts past the retention window or beyond MAX_ARTIFACTS."""
+    done = (
+        db.query(models.ExportJob)
+        .filter(models.ExportJob.status == "done")
+        .order_by(models.ExportJob.finished_at.desc())
+        .all()
+    )
+    cutoff = datetime.utcnow() - RETENTION
+    for i, job in enumerate(done):
+        if i < MAX_ARTIFACTS and job.finished_at and job.finished_at >= cutoff:
+            continue
+        if job.filename:
+            (EXPORT_DIR / job.filename).unlink(missing_ok=True)
+        job.status = "expired"
+        job.filename = None
+    db.commit()
@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from . import models, serializers
+
+# "Tasks I'm tagged on", newest tag first. Pages are keyset-paged on
+# (task_tags.created_at, task_tags.id) so every page is one range scan of
+# ix_task_tags_member_created, however deep the member scrolls. Tags newer
+# than the member's inbox marker are unread.
+Cursor = serializers.Cursor
+
+tags = serializers.tags_table
+tasks = serializers.tasks_table
+
+
+def seen_at(db: Session, member_id: int) -> Optional[datetime]:
+    return db.query(models.InboxMarker.seen_at).filter(models.InboxMarker.member_id == member_id).scalar()
+
+
+def mark_seen(db: Session, member_id: int, when: datetime):
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    # a future marker would silence every tag until then
+    when = min(when, datetime.utcnow())
+    marker = db.get(models.InboxMarker, member_id)
+    if marker is None:
+        db.add(models.InboxMarker(member_id=member_id, seen_at=when))
+    elif when > marker.seen_at:
+        # never move backwards: a stale tab must not resurrect read items
+        marker.seen_at = when
+
+
+def unread_count(db: Session, member_id: int, seen: Optional[datetime]) -> int:
+    stmt = select(func.count()).select_from(tags).where(tags.c.member_id == member_id)
+    if seen is not None:
+        stmt = stmt.where(tags.c.created_at > seen)
+    return db.execute(stmt).scalar()
+
+
+def page(
+    db: Session, member_id: int, after: Optional[Cursor], limit: int, seen: Optional[datetime]
+) -> List[Tuple[Cursor, dict]]:
+    """Up to ``limit`` (cursor key, inbox item) pairs older than ``after``, newest first."""
+    stmt = select(tags.c.id, tags.c.task_id, tags.c.created_at).where(tags.c.member_id == member_id)
+    if after:
+        tagged_at, tag_id = after
+        stmt = stmt.where(
+            or_(tags.c.created_at < tagged_at, and_(tags.c.created_at == tagged_at, tags.c.id < tag_id))
+        )
+    hits = db.execute(stmt.order_by(tags.c.created_at.desc(), tags.c.id.desc()).limit(limit)).all()
+    if not hits:
+        return []
+
+    rows = serializers.fetch_tasks(
+        db, serializers.select_tasks().where(tasks.c.id.in_([hit.task_id for hit in hits]))
+    )
+    by_id = {row["id"]: row for row in rows}
+    return [
+        (
+            (hit.created_at, hit.id),
+            {**by_id[hit.task_id], "tagged_at": hit.created_at, "unread": seen is None or hit.created_at > seen},
+        )
+        for hit in hits
+        if hit.task_id in by_id
+    ]
+
+
+def merge(parts: List[Tuple[list, int]], limit: int) -> dict:
+    """Combine per-shard ``(page(..., limit + 1), unread_count)`` results into one page."""
+    hits = sorted((hit for items, _ in parts for hit in items), key=lambda hit: hit[0], reverse=True)
+    return {
+        "items": [item for _, item in hits[:limit]],
+        "next_cursor": serializers.encode_cursor(hits[limit - 1][0]) if len(hits) > limit else None,
+        "unread": sum(count for _, count in parts),
+    }
@@ -1,24 +1,40 @@
-import csv
-import io
-from openpyxl import Workbook
 import base64
+import json
 from pathlib import Path
 from io import BytesIO
 from PIL import Image
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import and_, insert, or_, true
 from sqlalchemy.orm import Session
 
-from . import models, schemas, security
-from .db import Base, engine, get_db
+from . import (
+    archive,
+    backup,
+    bootstrap,
+    exports,
+    inbox,
+    models,
+    profiling,
+    replica,
+    reporting,
+    schemas,
+    security,
+    serializers,
+    shards,
+    writer,
+)
+from .db import SessionLocal, get_db
 
 app = FastAPI(title="Team Effort Tracker", version="0.2.0")
+# must be set before any route is declared: lets a flagged request be profiled
+app.router.route_class = profiling.ProfiledRoute
 
 frontend_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
 app.mount("/static", StaticFiles(directory=frontend_dir), name="static")
@@ -37,8 +53,14 @@ def get_current_member(
 ) -> models.Member:
     if credentials is None:
         raise HTTPException(status_code=401, detail="Auth token required")
-    token = credentials.credentials
-    session = (
+    session = _session_for(db, credentials.credentials)
+    if not session:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return session.member
+
+
+def _session_for(db: Session, token: str) -> Optional[models.SessionToken]:
+    return (
         db.query(models.SessionToken)
         .filter(
             models.SessionToken.token == token,
@@ -46,72 +68,65 @@ def get_current_member(
         )
         .first()
     )
-    if not session:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-    return session.member
+
+
+def _is_lead_token(token: str) -> bool:
+    with SessionLocal() as db:
+        session = _session_for(db, token)
+        return bool(session and session.member.is_lead)
+
+
+app.middleware("http")(profiling.middleware(_is_lead_token))
+
+
+def run_write(db: Session, apply, on_error=None):
+    """Apply ``apply(session)`` and commit it, returning its result.
+
+    With WRITE_QUEUE=1 the write goes through the single writer thread and is
+    group-committed with concurrent writes; ``apply`` then gets the writer's
+    session, so it must load what it changes by id rather than reuse objects
+    from ``db``, and should return plain values. ``on_error`` is called when
+    the write failed and was certainly not applied.
+    """
+    if not writer.ENABLED:
+        try:
+            result = apply(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            if on_error:
+                on_error()
+            raise
+        return result
+    try:
+        result = writer.queue_for(db.get_bind()).submit(apply)
+    except writer.WriteTimeout:
+        # still queued: the change may yet be applied, so don't invite a blind retry
+        raise HTTPException(status_code=503, detail="Write timed out; reload before retrying")
+    except Exception as e:
+        if on_error:
+            on_error()
+        if isinstance(e, (writer.QueueFull, writer.BatchFailed)):
+            raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+        raise
+    # drop anything this request cached before the writer committed
+    db.expire_all()
+    return result
 
 
 @app.on_event("startup")
 def startup_event():
-    Base.metadata.create_all(bind=engine)
-    with next(get_db()) as db:
-        # Ensure standard teams exist (OPS, DevOPS, Infra). Create any that are missing.
-        standard_names = ("OPS", "DevOPS", "Infra")
-        created_any = False
-        existing = {t.name for t in db.query(models.Team).all()}
-        teams_map = {}
-        for tname in standard_names:
-            team = db.query(models.Team).filter(models.Team.name == tname).first()
-            if not team:
-                team = models.Team(name=tname)
-                db.add(team)
-                db.flush()
-                created_any = True
-            teams_map[tname] = team
-
-        # If the DB was empty before, also seed a lead and sample members and task
-        if db.query(models.Team).count() == len(standard_names) and created_any:
-            lead = models.Member(
-                username="alex.lead",
-                password_hash=security.hash_password("changeme"),
-                name="Alex Lead",
-                career_level="Lead",
-                is_lead=True,
-                team_id=teams_map["OPS"].id,
-            )
-            member_a = models.Member(
-                username="bailey.dev",
-                password_hash=security.hash_password("changeme"),
-                name="Bailey Dev",
-                career_level="Senior",
-                team_id=teams_map["OPS"].id,
-            )
-            member_b = models.Member(
-                username="casey.analyst",
-                password_hash=security.hash_password("changeme"),
-                name="Casey Analyst",
-                career_level="Associate",
-                team_id=teams_map["OPS"].id,
-            )
-            db.add_all([lead, member_a, member_b])
-            db.flush()
-            sample_task = models.Task(
-                title="Onboard new feature",
-                details="Initial scaffolding and environment setup",
-                hours_spent=3.5,
-                due_date=datetime.utcnow().date() + timedelta(days=2),
-                comments="Need API keys",
-                assignee_id=member_a.id,
-                creator_id=lead.id,
-            )
-            db.add(sample_task)
-            db.commit()
+    # `python -m backend.serve` bootstraps once before forking its workers;
+    # anything else (e.g. `uvicorn --workers N`) serialises on the file lock
+    if not os.getenv(bootstrap.SKIP_ENV):
+        bootstrap.run_locked()
+    bootstrap.warm()
 
-        # Ensure all members are currently assigned to OPS (as requested)
-        ops = db.query(models.Team).filter(models.Team.name == 'OPS').first()
-        if ops:
-            db.query(models.Member).update({models.Member.team_id: ops.id})
-            db.commit()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    exports.shutdown()
+    writer.stop_all()
 
 
 @app.get("/", response_class=FileResponse)
@@ -135,8 +150,7 @@ def login(payload: schemas.MemberLogin, db: Session = Depends(get_db)):
         member_id=user.id,
         expires_at=security.token_expiry(),
     )
-    db.add(session)
-    db.commit()
+    run_write(db, lambda s: s.add(session))
     return schemas.AuthResponse(access_token=token, member=user)
 
 
@@ -148,9 +162,13 @@ def change_password(
 ):
     if not security.verify_password(payload.current_password, current.password_hash):
         raise HTTPException(status_code=401, detail="Current password is incorrect")
-    
-    current.password_hash = security.hash_password(payload.new_password)
-    db.commit()
+
+    password_hash = security.hash_password(payload.new_password)
+
+    def apply(s: Session):
+        s.get(models.Member, current.id).password_hash = password_hash
+
+    run_write(db, apply)
     return {"message": "Password changed successfully"}
 
 
@@ -232,18 +250,20 @@ def upload_member_avatar(
 
 
 @app.get("/api/members/{member_id}/avatar")
-def get_member_avatar(member_id: int):
+def get_member_avatar(member_id: int, request: Request):
     avatars_dir = Path(os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "avatars"))
+    info = {"exists": False}
     for ext in ("png", "jpg", "webp"):
         p = avatars_dir / f"{member_id}.{ext}"
         if p.exists():
-            return {
+            info = {
                 "exists": True,
                 "url": f"/static/avatars/{member_id}.{ext}",
                 "size": p.stat().st_size,
                 "modified_at": p.stat().st_mtime,
             }
-    return {"exists": False}
+            break
+    return serializers.etag_response(request, json.dumps(info).encode())
 
 
 @app.delete("/api/members/{member_id}/avatar")
@@ -282,21 +302,28 @@ def create_user(
         is_lead=payload.is_lead,
         team_id=payload.team_id,
     )
-    db.add(member)
-    db.commit()
-    db.refresh(member)
-    return member
+
+    def apply(s: Session):
+        s.add(member)
+        s.flush()
+        return member.id
+
+    return db.get(models.Member, run_write(db, apply))
 
 
 @app.get("/api/teams", response_model=List[schemas.Team])
-def list_teams(db: Session = Depends(get_db)):
+def list_teams(request: Request, db: Session = Depends(get_db)):
     # return teams including their IDs so the frontend can build selects
-    return db.query(models.Team).all()
+    teams = db.query(models.Team).all()
+    return serializers.etag_response(request, serializers.orm_json(serializers.team_list_adapter, teams))
 
 
 @app.get("/api/members", response_model=List[schemas.Member])
-def list_members(db: Session = Depends(get_db), current: models.Member = Depends(get_current_member)):
-    return db.query(models.Member).order_by(models.Member.name).all()
+def list_members(
+    request: Request, db: Session = Depends(get_db), current: models.Member = Depends(get_current_member)
+):
+    members = db.query(models.Member).order_by(models.Member.name).all()
+    return serializers.etag_response(request, serializers.orm_json(serializers.member_list_adapter, members))
 
 
 @app.put("/api/members/{member_id}", response_model=schemas.Member)
@@ -312,17 +339,22 @@ def update_member(
         raise HTTPException(status_code=404, detail="Member not found")
 
     changes = payload.model_dump(exclude_unset=True)
-    if "username" in changes and changes["username"]:
-        member.username = changes["username"]
-    if "password" in changes and changes["password"]:
-        member.password_hash = security.hash_password(changes["password"])
-
-    for key, value in changes.items():
-        if key in {"username", "password"}:
-            continue
-        setattr(member, key, value)
-
-    db.commit()
+    # hash outside the write so the writer never waits on bcrypt
+    password_hash = security.hash_password(changes["password"]) if changes.get("password") else None
+
+    def apply(s: Session):
+        member = s.get(models.Member, member_id)
+        if "username" in changes and changes["username"]:
+            member.username = changes["username"]
+        if password_hash:
+            member.password_hash = password_hash
+
+        for key, value in changes.items():
+            if key in {"username", "password"}:
+                continue
+            setattr(member, key, value)
+
+    run_write(db, apply)
     db.refresh(member)
     return member
 
@@ -336,60 +368,107 @@ def delete_member(
     member = db.query(models.Member).filter(models.Member.id == member_id).first()
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
-    db.delete(member)
-    db.commit()
+    run_write(db, lambda s: s.delete(s.get(models.Member, member_id)))
     return None
 
 
 @app.get("/api/tasks", response_model=List[schemas.Task])
 def list_tasks(
     member_id: Optional[int] = Query(None, description="Filter by assignee"),
-    db: Session = Depends(get_db),
+    include_archived: bool = Query(False, description="Also return archived (old completed) tasks"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=serializers.PAGE_MAX, description="Page size; the next page's cursor is in X-Next-Cursor"
+    ),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    router: shards.TaskRouter = Depends(shards.get_task_router),
     current: models.Member = Depends(get_current_member),
 ):
-    query = db.query(models.Task).order_by(models.Task.created_at.desc())
+    current_id, is_lead = current.id, current.is_lead
+    try:
+        after = serializers.decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def visible(table):
+        if member_id:
+            return table.c.assignee_id == member_id
+        if not is_lead:
+            return (table.c.assignee_id == current_id) | (table.c.creator_id == current_id)
+        return true()
+
+    def query(table):
+        stmt = serializers.select_tasks(table).where(visible(table))
+        if after:
+            created_at, task_id = after
+            stmt = stmt.where(
+                or_(table.c.created_at < created_at, and_(table.c.created_at == created_at, table.c.id < task_id))
+            )
+        stmt = stmt.order_by(table.c.created_at.desc(), table.c.id.desc())
+        # one row more than a page tells whether there is a next one
+        return stmt.limit(limit + 1) if limit else stmt
+
+    def fetch(db: Session):
+        rows = serializers.fetch_tasks(db, query(serializers.tasks_table))
+        if include_archived:
+            rows += serializers.fetch_tasks(db, query(archive.tasks), archive.task_tags, archived=True)
+        return rows
+
+    parts = router.fan_out(fetch)
+    rows = [row for part in parts for row in part]
+    if len(parts) > 1 or (limit and include_archived):
+        rows.sort(key=lambda row: (row["created_at"], row["id"]), reverse=True)
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = serializers.encode_cursor((rows[-1]["created_at"], rows[-1]["id"]))
+    return serializers.tasks_response(rows, next_cursor)
+
+
+@app.get("/api/tasks/inbox")
+def task_inbox(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    router: shards.TaskRouter = Depends(shards.get_task_router),
+    current: models.Member = Depends(get_current_member),
+):
+    try:
+        after = serializers.decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    member_id = current.id
+    seen = inbox.seen_at(router.db, member_id)
+    parts = router.fan_out(
+        lambda db: (inbox.page(db, member_id, after, limit + 1, seen), inbox.unread_count(db, member_id, seen))
+    )
+    return serializers.inbox_response(inbox.merge(parts, limit))
 
-    if member_id:
-        query = query.filter(models.Task.assignee_id == member_id)
-    elif not current.is_lead:
-        query = query.filter(
-            (models.Task.assignee_id == current.id) | (models.Task.creator_id == current.id)
-        )
 
-    tasks = query.all()
-    result = []
-    for task in tasks:
-        tag_member_ids = [t.member_id for t in task.tags]
-        item = schemas.Task(
-            id=task.id,
-            title=task.title,
-            details=task.details,
-            hours_spent=float(task.hours_spent) if task.hours_spent is not None else None,
-            due_date=task.due_date,
-            blockers=task.blockers,
-            comments=task.comments,
-            status=task.status,
-            assignee_id=task.assignee_id,
-            creator_id=task.creator_id,
-            created_at=task.created_at,
-            updated_at=task.updated_at,
-            tags=tag_member_ids,
-        )
-        result.append(item)
-    return result
+@app.post("/api/tasks/inbox/seen")
+def mark_inbox_seen(
+    payload: Optional[schemas.InboxSeen] = None,
+    db: Session = Depends(get_db),
+    current: models.Member = Depends(get_current_member),
+):
+    when = (payload and payload.seen_at) or datetime.utcnow()
+    member_id = current.id
+    run_write(db, lambda s: inbox.mark_seen(s, member_id, when))
+    return {"seen_at": inbox.seen_at(db, member_id)}
 
 
 @app.post("/api/tasks", response_model=schemas.Task, status_code=201)
 def create_task(
     payload: schemas.TaskCreate,
-    db: Session = Depends(get_db),
+    router: shards.TaskRouter = Depends(shards.get_task_router),
     current: models.Member = Depends(get_current_member),
 ):
     assignee_id = payload.assignee_id or current.id
     if not current.is_lead and assignee_id != current.id:
         raise HTTPException(status_code=403, detail="Members can only create tasks for themselves")
 
+    db, task_id = router.for_new_task(assignee_id)
     task = models.Task(
+        id=task_id,
         title=payload.title,
         details=payload.details,
         hours_spent=payload.hours_spent,
@@ -400,38 +479,28 @@ def create_task(
         assignee_id=assignee_id,
         creator_id=current.id,
     )
-    db.add(task)
-    db.flush()
-    for member_id in payload.tags:
-        db.add(models.TaskTag(task_id=task.id, member_id=member_id))
-    db.commit()
-    db.refresh(task)
-    tag_ids = [t.member_id for t in task.tags]
-    return schemas.Task(
-        id=task.id,
-        title=task.title,
-        details=task.details,
-        hours_spent=float(task.hours_spent) if task.hours_spent is not None else None,
-        due_date=task.due_date,
-        blockers=task.blockers,
-        comments=task.comments,
-        status=task.status,
-        assignee_id=task.assignee_id,
-        creator_id=task.creator_id,
-        created_at=task.created_at,
-        updated_at=task.updated_at,
-        tags=tag_ids,
-    )
+
+    def apply(s: Session):
+        s.add(task)
+        s.flush()
+        for member_id in payload.tags:
+            s.add(models.TaskTag(task_id=task.id, member_id=member_id))
+        return task.id
+
+    # the id was taken from task_directory up front; give it back if the insert fails
+    created = run_write(db, apply, on_error=lambda: router.release(task_id))
+    return serializers.task_response(db, created, status_code=201)
 
 
 @app.put("/api/tasks/{task_id}", response_model=schemas.Task)
 def update_task(
     task_id: int,
     payload: schemas.TaskUpdate,
-    db: Session = Depends(get_db),
+    router: shards.TaskRouter = Depends(shards.get_task_router),
     current: models.Member = Depends(get_current_member),
 ):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    db = router.for_task(task_id)
+    task = db.query(models.Task).filter(models.Task.id == task_id).first() if db else None
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
@@ -442,42 +511,46 @@ def update_task(
     if "assignee_id" in changes and changes["assignee_id"] != task.assignee_id:
         ensure_lead(current)
 
-    for key, value in changes.items():
-        if key == "tags" and value is not None:
-            db.query(models.TaskTag).filter(models.TaskTag.task_id == task.id).delete()
-            for member_id in value:
-                db.add(models.TaskTag(task_id=task.id, member_id=member_id))
-        else:
-            setattr(task, key, value)
-
-    db.commit()
-    db.refresh(task)
-    tag_ids = [t.member_id for t in task.tags]
-    return schemas.Task(
-        id=task.id,
-        title=task.title,
-        details=task.details,
-        hours_spent=float(task.hours_spent) if task.hours_spent is not None else None,
-        due_date=task.due_date,
-        blockers=task.blockers,
-        comments=task.comments,
-        status=task.status,
-        assignee_id=task.assignee_id,
-        creator_id=task.creator_id,
-        created_at=task.created_at,
-        updated_at=task.updated_at,
-        tags=tag_ids,
-    )
+    def apply(s: Session):
+        target = s.get(models.Task, task_id)
+        for key, value in changes.items():
+            if key == "tags" and value is not None:
+                # only touch tags that changed: a tag's created_at is when it
+                # landed in that member's inbox, so re-adding it would mark the
+                # task unread again on every edit
+                wanted = set(value)
+                current_tags = {
+                    member_id
+                    for (member_id,) in s.query(models.TaskTag.member_id).filter(models.TaskTag.task_id == task_id)
+                }
+                removed = current_tags - wanted
+                if removed:
+                    s.query(models.TaskTag).filter(
+                        models.TaskTag.task_id == task_id, models.TaskTag.member_id.in_(removed)
+                    ).delete(synchronize_session=False)
+                added = sorted(wanted - current_tags)
+                if added:
+                    # a concurrent edit may have added the same tag since the read above
+                    s.execute(
+                        insert(models.TaskTag).prefix_with("OR IGNORE", dialect="sqlite"),
+                        [{"task_id": task_id, "member_id": member_id} for member_id in added],
+                    )
+            else:
+                setattr(target, key, value)
+
+    run_write(db, apply)
+    return serializers.task_response(db, task_id)
 
 
 @app.post("/api/tasks/{task_id}/tag", status_code=201)
 def tag_task(
     task_id: int,
     payload: schemas.TaskTagCreate,
-    db: Session = Depends(get_db),
+    router: shards.TaskRouter = Depends(shards.get_task_router),
     current: models.Member = Depends(get_current_member),
 ):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    db = router.for_task(task_id)
+    task = db.query(models.Task).filter(models.Task.id == task_id).first() if db else None
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
@@ -492,11 +565,72 @@ def tag_task(
     if existing:
         return {"detail": "Already tagged"}
 
-    db.add(models.TaskTag(task_id=task_id, member_id=payload.member_id))
-    db.commit()
+    run_write(db, lambda s: s.add(models.TaskTag(task_id=task_id, member_id=payload.member_id)))
     return {"detail": "Tagged"}
 
 
+@app.post("/api/admin/archive")
+def archive_tasks(
+    payload: schemas.ArchiveRequest,
+    router: shards.TaskRouter = Depends(shards.get_task_router),
+    current: models.Member = Depends(get_current_member),
+):
+    ensure_lead(current)
+    if not archive.ENABLED:
+        raise HTTPException(status_code=400, detail="Archiving requires a SQLite database")
+    moved = router.fan_out(
+        lambda db: archive.archive_completed(db, payload.older_than_days, payload.batch_size)
+    )
+    return {"archived": sum(moved)}
+
+
+@app.post("/api/admin/unarchive")
+def unarchive_tasks(
+    payload: schemas.UnarchiveRequest,
+    router: shards.TaskRouter = Depends(shards.get_task_router),
+    current: models.Member = Depends(get_current_member),
+):
+    ensure_lead(current)
+    if not archive.ENABLED:
+        raise HTTPException(status_code=400, detail="Archiving requires a SQLite database")
+    if not (payload.task_ids or payload.created_from or payload.created_to):
+        raise HTTPException(status_code=400, detail="Provide task_ids or a created_from/created_to range")
+    created_from = datetime.combine(payload.created_from, datetime.min.time()) if payload.created_from else None
+    created_to = datetime.combine(payload.created_to, datetime.max.time()) if payload.created_to else None
+    moved = router.fan_out(
+        lambda db: archive.unarchive(db, task_ids=payload.task_ids, created_from=created_from, created_to=created_to)
+    )
+    return {"restored": sum(moved)}
+
+
+@app.post("/api/admin/backup")
+def backup_database(current: models.Member = Depends(get_current_member)):
+    ensure_lead(current)
+    if not backup.ENABLED:
+        raise HTTPException(status_code=400, detail="Backups require a SQLite database")
+    try:
+        return backup.run()
+    except backup.BackupBusy:
+        raise HTTPException(status_code=409, detail="A backup is already running")
+    except (RuntimeError, OSError) as e:
+        raise HTTPException(status_code=500, detail=f"Backup failed: {e}")
+
+
+@app.get("/api/admin/profiles")
+def list_profiles(current: models.Member = Depends(get_current_member)):
+    ensure_lead(current)
+    return profiling.summaries()
+
+
+@app.get("/api/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, current: models.Member = Depends(get_current_member)):
+    ensure_lead(current)
+    record = profiling.load(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return record
+
+
 @app.get("/api/reports")
 def reports(
     period: str = Query("weekly", pattern="^(weekly|monthly|semester)$"),
@@ -505,7 +639,7 @@ def reports(
     end_date: Optional[str] = Query(None),
     member_id: Optional[int] = Query(None),
     status: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    router: shards.TaskRouter = Depends(replica.get_read_router),
     current: models.Member = Depends(get_current_member),
 ):
     # allow leads to run reports for anyone; non-leads may only run reports for themselves
@@ -516,152 +650,98 @@ def reports(
         # force member_id to current user so non-leads only see their own data
         member_id = current.id
 
-    today = datetime.utcnow().date()
+    try:
+        s_date, e_date = reporting.date_range(period, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # determine date range: explicit start/end override period
-    if start_date:
-        try:
-            s_date = datetime.fromisoformat(start_date).date()
-        except Exception:
-            raise HTTPException(status_code=400, detail="Invalid start_date format, use YYYY-MM-DD")
-    else:
-        if period == "weekly":
-            s_date = today - timedelta(days=7)
-        elif period == "monthly":
-            s_date = today - timedelta(days=30)
-        else:
-            s_date = today - timedelta(days=182)
-
-    if end_date:
-        try:
-            e_date = datetime.fromisoformat(end_date).date()
-        except Exception:
-            raise HTTPException(status_code=400, detail="Invalid end_date format, use YYYY-MM-DD")
-    else:
-        e_date = today
-
-    # Build base query
-    q = db.query(models.Task)
-    # filter by created_at in range
-    q = q.filter(models.Task.created_at >= datetime.combine(s_date, datetime.min.time()))
-    q = q.filter(models.Task.created_at <= datetime.combine(e_date, datetime.max.time()))
-
-    if member_id:
-        q = q.filter(models.Task.assignee_id == member_id)
-
-    if status:
-        # allow comma-separated statuses
-        statuses = [s.strip() for s in status.split(",") if s.strip()]
-        q = q.filter(models.Task.status.in_(statuses))
-
-    tasks = q.all()
-
-    report_rows = []
-    total_hours = 0.0
-    total_blockers = 0
-    tasks_past_due = 0
-    tasks_completed_past_due = 0
-
-    for task in tasks:
-        hours = float(task.hours_spent) if task.hours_spent else 0.0
-        total_hours += hours
-        has_blockers = bool(task.blockers and task.blockers.strip())
-        if has_blockers:
-            total_blockers += 1
-
-        past_due = False
-        completed_past_due = False
-        color_key = "in_progress"
-
-        if task.due_date:
-            if task.status != "completed" and task.due_date < today:
-                past_due = True
-            if task.status == "completed":
-                # use updated_at as completion time
-                comp_date = task.updated_at.date() if task.updated_at else task.created_at.date()
-                if task.due_date and comp_date > task.due_date:
-                    completed_past_due = True
-
-        # determine color key
-        if task.status == "completed":
-            color_key = "completed_past_due" if completed_past_due else "completed_on_time"
-        else:
-            if task.due_date:
-                days_to_due = (task.due_date - today).days
-                if task.due_date < today:
-                    color_key = "past_due"
-                elif days_to_due <= 2:
-                    color_key = "nearing_deadline"
-                else:
-                    # just started if created recently
-                    if (datetime.utcnow().date() - task.created_at.date()).days <= 3:
-                        color_key = "just_started"
-                    else:
-                        color_key = "in_progress"
-            else:
-                color_key = "in_progress"
-
-        if past_due:
-            tasks_past_due += 1
-        if completed_past_due:
-            tasks_completed_past_due += 1
-
-        row = {
-            "task_id": task.id,
-            "title": task.title,
-            "assignee_id": task.assignee_id,
-            "assignee": task.assignee.name if task.assignee else None,
-            "hours_spent": hours if hours else None,
-            "status": task.status,
-            "due_date": task.due_date.isoformat() if task.due_date else None,
-            "created_at": task.created_at.isoformat(),
-            "updated_at": task.updated_at.isoformat() if task.updated_at else None,
-            "has_blockers": has_blockers,
-            "color_key": color_key,
-        }
-        report_rows.append(row)
-
-    summary = {
-        "total_tasks": len(report_rows),
-        "total_hours": total_hours,
-        "total_blockers": total_blockers,
-        "tasks_past_due": tasks_past_due,
-        "tasks_completed_past_due": tasks_completed_past_due,
-        "start_date": s_date.isoformat(),
-        "end_date": e_date.isoformat(),
-    }
+    report = reporting.build(router, s_date, e_date, member_id, status)
 
     if format == "json":
-        return {"summary": summary, "rows": report_rows}
+        return report
+
+    # returned responses don't pick up headers set by dependencies
+    read_engine = {replica.HEADER: replica.served_by(router.db)}
 
     if format == "xlsx":
-        wb = Workbook()
-        ws = wb.active
-        headers = ["task_id", "title", "assignee", "hours_spent", "status", "due_date", "created_at"]
-        ws.append(headers)
-        for row in report_rows:
-            ws.append([row.get(h) for h in headers])
-        bio = io.BytesIO()
-        wb.save(bio)
-        bio.seek(0)
-        filename = f"report_{s_date.isoformat()}_{e_date.isoformat()}.xlsx"
         return StreamingResponse(
-            iter([bio.read()]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+            iter([reporting.to_xlsx(report["rows"])]),
+            media_type=reporting.XLSX_MEDIA_TYPE,
+            headers={
+                "Content-Disposition": f'attachment; filename="{reporting.filename(report, "xlsx")}"',
+                **read_engine,
+            },
         )
 
     # CSV output
-    output = io.StringIO()
-    fieldnames = ["task_id", "title", "assignee", "hours_spent", "status", "due_date", "created_at"]
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    for row in report_rows:
-        writer.writerow({k: row.get(k) for k in fieldnames})
-    output.seek(0)
-    filename = f"report_{s_date.isoformat()}_{e_date.isoformat()}.csv"
     return StreamingResponse(
-        iter([output.read()]),
+        iter([reporting.to_csv(report["rows"])]),
         media_type="text/csv",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
\ No newline at end of file
+        headers={
+            "Content-Disposition": f'attachment; filename="{reporting.filename(report, "csv")}"',
+            **read_engine,
+        },
+    )
+
+
+def _job_for(job_id: int, db: Session, current: models.Member) -> models.ExportJob:
+    job = db.query(models.ExportJob).filter(models.ExportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    # jobs are shared between identical requests, so access follows the data
+    # scope rather than who happened to queue it first
+    if not current.is_lead and json.loads(job.params).get("member_id") != current.id:
+        raise HTTPException(status_code=403, detail="Not allowed to view this export")
+    return job
+
+
+@app.post("/api/reports/jobs", response_model=schemas.ReportJob, status_code=202)
+def create_report_job(
+    payload: schemas.ReportJobCreate,
+    db: Session = Depends(get_db),
+    current: models.Member = Depends(get_current_member),
+):
+    member_id = payload.member_id
+    if not current.is_lead:
+        if member_id and member_id != current.id:
+            raise HTTPException(status_code=403, detail="Team lead privileges required to view other members' reports")
+        member_id = current.id
+
+    try:
+        s_date, e_date = reporting.date_range(payload.period, payload.start_date, payload.end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    params = {
+        "format": payload.format,
+        "start_date": s_date.isoformat(),
+        "end_date": e_date.isoformat(),
+        "member_id": member_id,
+        "status": payload.status or None,
+    }
+    return exports.submit(db, params, current.id)
+
+
+@app.get("/api/reports/jobs/{job_id}", response_model=schemas.ReportJob)
+def get_report_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current: models.Member = Depends(get_current_member),
+):
+    return _job_for(job_id, db, current)
+
+
+@app.get("/api/reports/jobs/{job_id}/download")
+def download_report_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current: models.Member = Depends(get_current_member),
+):
+    job = _job_for(job_id, db, current)
+    path = exports.artifact_path(job)
+    if path is None:
+        if job.status in exports.IN_FLIGHT:
+            raise HTTPException(status_code=409, detail="Export is not finished yet")
+        raise HTTPException(status_code=404, detail="Export file not available")
+    media_type = reporting.XLSX_MEDIA_TYPE if job.format == "xlsx" else "text/csv"
+    return FileResponse(path, media_type=media_type, filename=job.filename.split("_", 1)[1])
@@ -0,0 +1,22 @@
+-- Migration: background report export jobs (SQLite version)
+-- Up
+CREATE TABLE IF NOT EXISTS export_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key VARCHAR(64) NOT NULL,
+    params TEXT NOT NULL,
+    format VARCHAR(10) NOT NULL,
+    status VARCHAR(20) DEFAULT 'queued',
+    progress INTEGER DEFAULT 0,
+    filename VARCHAR(255),
+    error TEXT,
+    requested_by INTEGER,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME,
+    FOREIGN KEY(requested_by) REFERENCES members(id) ON DELETE SET NULL
+);
+-- identical exports share one job while it is queued or running
+CREATE UNIQUE INDEX IF NOT EXISTS uq_export_jobs_in_flight_key
+    ON export_jobs(key) WHERE status IN ('queued', 'running');
+
+-- Down (rollback)
+-- DROP TABLE export_jobs;
@@ -0,0 +1,15 @@
+-- Migration: tagged-task inbox (SQLite version)
+-- Up
+-- a member's tags, newest first (also created on startup if missing)
+CREATE INDEX IF NOT EXISTS ix_task_tags_member_created ON task_tags(member_id, created_at);
+
+-- when each member last opened their inbox; newer tags are unread
+CREATE TABLE IF NOT EXISTS inbox_markers (
+    member_id INTEGER PRIMARY KEY,
+    seen_at DATETIME NOT NULL,
+    FOREIGN KEY(member_id) REFERENCES members(id) ON DELETE CASCADE
+);
+
+-- Down (rollback)
+-- DROP TABLE inbox_markers;
+-- DROP INDEX ix_task_tags_member_created;
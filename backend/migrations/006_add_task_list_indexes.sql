@@ -0,0 +1,9 @@
+-- Migration: indexes for paged task lists (SQLite version)
+-- Up
+-- /api/tasks?limit=... pages newest first (also created on startup if missing)
+CREATE INDEX IF NOT EXISTS ix_tasks_assignee_created ON tasks(assignee_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_tasks_created_at ON tasks(created_at);
+
+-- Down (rollback)
+-- DROP INDEX ix_tasks_created_at;
+-- DROP INDEX ix_tasks_assignee_created;
@@ -0,0 +1,8 @@
+-- Migration: record when an export job started running (SQLite version)
+-- Up
+-- stale running jobs are timed from here rather than from created_at
+ALTER TABLE export_jobs ADD COLUMN started_at DATETIME;
+
+-- Down (rollback)
+-- SQLite does not support DROP COLUMN directly; you would need to
+-- rebuild the table without it if you truly want to remove it.
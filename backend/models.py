@@ -5,11 +5,13 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
     Text,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import relationship
 
@@ -43,6 +45,7 @@ class Member(Base):
     tasks = relationship("Task", back_populates="assignee", foreign_keys="Task.assignee_id")
     created_tasks = relationship("Task", back_populates="creator", foreign_keys="Task.creator_id")
     tagged_tasks = relationship("TaskTag", back_populates="member")
+    inbox_marker = relationship("InboxMarker", uselist=False, cascade="all, delete-orphan")
 
     @property
     def team_name(self):
@@ -51,6 +54,12 @@ class Member(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # task list pages, newest first, for one member or for everyone (the
+        # rowid SQLite appends is the cursor's tie-breaker)
+        Index("ix_tasks_assignee_created", "assignee_id", "created_at"),
+        Index("ix_tasks_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
@@ -72,7 +81,12 @@ class Task(Base):
 
 class TaskTag(Base):
     __tablename__ = "task_tags"
-    __table_args__ = (UniqueConstraint("task_id", "member_id", name="uq_task_member_tag"),)
+    __table_args__ = (
+        UniqueConstraint("task_id", "member_id", name="uq_task_member_tag"),
+        # a member's inbox, newest first (SQLite appends the rowid, which the
+        # keyset cursor uses as the tie-breaker)
+        Index("ix_task_tags_member_created", "member_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"))
@@ -92,4 +106,56 @@ class SessionToken(Base):
     expires_at = Column(DateTime, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    member = relationship("Member")
\ No newline at end of file
+    member = relationship("Member")
+
+
+class InboxMarker(Base):
+    """When a member last looked at their inbox; newer tags count as unread."""
+
+    __tablename__ = "inbox_markers"
+
+    member_id = Column(Integer, ForeignKey("members.id", ondelete="CASCADE"), primary_key=True)
+    seen_at = Column(DateTime, nullable=False)
+
+
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+    # at most one queued/running job per distinct export request
+    __table_args__ = (
+        Index(
+            "uq_export_jobs_in_flight_key",
+            "key",
+            unique=True,
+            sqlite_where=text("status IN ('queued', 'running')"),
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(64), nullable=False)
+    params = Column(Text, nullable=False)
+    format = Column(String(10), nullable=False)
+    status = Column(String(20), default="queued")
+    progress = Column(Integer, default=0)
+    filename = Column(String(255), nullable=True)
+    error = Column(Text, nullable=True)
+    requested_by = Column(Integer, ForeignKey("members.id", ondelete="SET NULL"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    @property
+    def download_url(self):
+        """Return the artifact URL once the export has finished, or None."""
+        return f"/api/reports/jobs/{self.id}/download" if self.status == "done" else None
+
+
+def ensure_indexes(bind, tables):
+    """Create indexes declared on ``tables`` after the tables themselves existed.
+
+    create_all skips existing tables, so without this an older database never
+    gets indexes added to the models later.
+    """
+    for table in tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
@@ -0,0 +1,276 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+# On-demand request profiling. A lead adds `X-Profile: 1` (or `?profile=1`) to
+# any API call and that one request runs under cProfile and tracemalloc, with
+# every SQL statement timed. The result is stored as JSON in PROFILE_DIR and
+# the response says where: `X-Profile-Id` / `X-Profile-Url`. Optionally a
+# PROFILE_SAMPLE_RATE fraction of all API requests is profiled the same way.
+# Only the newest PROFILE_MAX_STORED profiles are kept.
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "profiles")
+)
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "20"))
+TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "30"))
+# statements beyond this are counted and timed but not listed
+MAX_STATEMENTS = 200
+
+HEADER = "X-Profile"
+QUERY_FLAG = "profile"
+URL_PREFIX = "/api/admin/profiles"
+
+_current = contextvars.ContextVar("profile", default=None)
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_store_lock = threading.Lock()
+# one profiled request at a time per process: from Python 3.12 on, enabling a
+# second cProfile.Profile while one is active raises ValueError
+_active = threading.Lock()
+
+
+class _Profile:
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.lock = threading.Lock()
+        self.sql = []
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        # the endpoint ran without cProfile (another profiler was active)
+        self.skipped = False
+
+    def add_statement(self, statement: str, duration_ms: float):
+        with self.lock:
+            self.sql_count += 1
+            self.sql_ms += duration_ms
+            if len(self.sql) < MAX_STATEMENTS:
+                self.sql.append({"statement": statement, "duration_ms": round(duration_ms, 3)})
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is not None and conn.info.get("profile_started"):
+        started = conn.info["profile_started"].pop()
+        profile.add_statement(statement, (time.perf_counter() - started) * 1000)
+
+
+def _enable(profile: _Profile) -> bool:
+    try:
+        profile.profiler.enable()
+    except ValueError:  # "Another profiling tool is already active"
+        profile.skipped = True
+        return False
+    return True
+
+
+def profiled(endpoint: Callable) -> Callable:
+    """Run ``endpoint`` under the request's profiler, if it has one.
+
+    Sync endpoints execute on a threadpool thread, and cProfile only sees the
+    thread it is enabled in (before Python 3.12), so it has to be switched on
+    around the call. If another profiler is already active (e.g. a debugger or
+    coverage run) the endpoint runs unprofiled.
+    """
+    if asyncio.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None or not _enable(profile):
+                return await endpoint(*args, **kwargs)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profile.profiler.disable()
+
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None or not _enable(profile):
+            return endpoint(*args, **kwargs)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profile.profiler.disable()
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0:
+            tracemalloc.start()
+        _tracing_users += 1
+        tracemalloc.reset_peak()
+
+
+def _stop_tracing() -> int:
+    global _tracing_users
+    with _tracing_lock:
+        _, peak = tracemalloc.get_traced_memory()
+        _tracing_users -= 1
+        if _tracing_users == 0:
+            tracemalloc.stop()
+        return peak
+
+
+def _top_functions(profiler: cProfile.Profile) -> List[dict]:
+    try:
+        stats = pstats.Stats(profiler).stats
+    except TypeError:  # nothing was recorded
+        return []
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    return [
+        {
+            "function": f"{os.path.relpath(file) if file.startswith('/') else file}:{line}({name})",
+            "calls": calls,
+            "total_ms": round(tt * 1000, 3),
+            "cumulative_ms": round(ct * 1000, 3),
+        }
+        for (file, line, name), (_, calls, tt, ct, _) in rows
+    ]
+
+
+def _store(record: dict):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{record['id']}.json")
+    with open(path + ".tmp", "w") as fh:
+        json.dump(record, fh, indent=2)
+    os.replace(path + ".tmp", path)
+    with _store_lock:
+        for old in list_ids()[MAX_STORED:]:
+            try:
+                os.remove(os.path.join(PROFILE_DIR, f"{old}.json"))
+            except FileNotFoundError:
+                pass
+
+
+def list_ids() -> List[str]:
+    """Stored profile ids, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted((n[:-5] for n in os.listdir(PROFILE_DIR) if n.endswith(".json")), reverse=True)
+
+
+def load(profile_id: str) -> Optional[dict]:
+    if profile_id not in list_ids():
+        return None
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json")) as fh:
+        return json.load(fh)
+
+
+def summaries() -> List[dict]:
+    keys = ("id", "method", "path", "status", "sampled", "started_at", "duration_ms", "sql_count", "peak_memory_kb")
+    result = []
+    for profile_id in list_ids():
+        try:
+            record = load(profile_id)
+        except (OSError, ValueError):  # pruned or half-written meanwhile
+            continue
+        if record:
+            result.append({**{k: record.get(k) for k in keys}, "url": f"{URL_PREFIX}/{profile_id}"})
+    return result
+
+
+def requested(request) -> bool:
+    return request.headers.get(HEADER) == "1" or request.query_params.get(QUERY_FLAG) == "1"
+
+
+def middleware(is_lead_token: Callable[[str], bool]):
+    """HTTP middleware; ``is_lead_token(token)`` authorises explicit requests."""
+
+    async def profile_requests(request, call_next):
+        path = request.url.path
+        if not path.startswith("/api/") or path.startswith(URL_PREFIX):
+            return await call_next(request)
+
+        sampled = False
+        if requested(request):
+            auth = request.headers.get("authorization", "")
+            token = auth[7:] if auth.lower().startswith("bearer ") else ""
+            # anyone else's flag is ignored rather than rejected
+            if not token or not await run_in_threadpool(is_lead_token, token):
+                return await call_next(request)
+        elif SAMPLE_RATE and random.random() < SAMPLE_RATE:
+            sampled = True
+        else:
+            return await call_next(request)
+
+        if not _active.acquire(blocking=False):
+            # another request is being profiled; serve this one normally
+            response = await call_next(request)
+            if not sampled:
+                response.headers["X-Profile-Skipped"] = "busy"
+            return response
+        try:
+            profile = _Profile()
+            reset = _current.set(profile)
+            _start_tracing()
+            started_at = datetime.utcnow()
+            started = time.perf_counter()
+            try:
+                response = await call_next(request)
+            finally:
+                duration_ms = (time.perf_counter() - started) * 1000
+                peak = _stop_tracing()
+                _current.reset(reset)
+        finally:
+            _active.release()
+
+        profile_id = f"{started_at.strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:6]}"
+        record = {
+            "id": profile_id,
+            "method": request.method,
+            "path": path,
+            "query": str(request.query_params),
+            "status": response.status_code,
+            "sampled": sampled,
+            "started_at": started_at.isoformat(),
+            "duration_ms": round(duration_ms, 3),
+            # tracemalloc is process-wide: concurrent requests count too
+            "peak_memory_kb": round(peak / 1024, 1),
+            "sql_count": profile.sql_count,
+            "sql_ms": round(profile.sql_ms, 3),
+            "sql": profile.sql,
+            "cprofile_skipped": profile.skipped,
+            "top_functions": _top_functions(profile.profiler),
+        }
+        await run_in_threadpool(_store, record)
+        if not sampled:
+            response.headers["X-Profile-Id"] = profile_id
+            response.headers["X-Profile-Url"] = f"{URL_PREFIX}/{profile_id}"
+        return response
+
+    return profile_requests
@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from fastapi import Response
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import archive, backup
+from .db import SessionLocal, sqlite_path
+from .shards import TaskRouter
+
+# Optional read-only engine for heavy reads (reports and exports), so long
+# analytic queries never hold the database lock or a pooled connection that
+# task saves are waiting for. READ_ENGINE picks how:
+#
+# - "wal":  switch the database to WAL journaling and read it through a
+#           separate `mode=ro` + `query_only` pool. Each read transaction sees a
+#           consistent snapshot and never blocks (or is blocked by) writers.
+# - "copy": read from a local copy refreshed with the SQLite backup API, in
+#           small page steps. The copy is refreshed in the background once it
+#           is half READ_MAX_STALENESS_SECONDS old; past the bound, reads fall
+#           back to the primary engine rather than serve older data.
+# - "off" (default): everything uses the primary engine.
+#
+# Responses served through here carry an `X-Read-Engine` header naming the
+# engine (and, for the copy, its age).
+MODE = os.getenv("READ_ENGINE", "off").lower()
+DB_PATH = sqlite_path()
+ENABLED = MODE in ("wal", "copy") and bool(DB_PATH)
+POOL_SIZE = int(os.getenv("READ_POOL_SIZE", "4"))
+MAX_STALENESS = float(os.getenv("READ_MAX_STALENESS_SECONDS", "60"))
+COPY_PATH = os.getenv(
+    "READ_COPY_PATH", "{}_readcopy{}".format(*os.path.splitext(DB_PATH)) if DB_PATH else ""
+)
+# the archive is copied next to the main copy, so both come from about the
+# same moment (a live archive would double-count tasks archived since)
+COPY_ARCHIVE_PATH = archive.path_for(COPY_PATH) if COPY_PATH else ""
+# refresh attempts when an archive move keeps landing between the two copies
+COPY_ATTEMPTS = 3
+# pages copied per backup step, and the pause between steps that lets writers in
+COPY_PAGES = int(os.getenv("READ_COPY_PAGES", "256"))
+COPY_PAUSE = float(os.getenv("READ_COPY_PAUSE_MS", "5")) / 1000
+
+HEADER = "X-Read-Engine"
+SERVED_BY = "served_by"
+
+_engine = None
+_sessionmaker = None
+_copy_inode = None
+_lock = threading.Lock()
+_refreshing = threading.Event()
+
+
+def prepare(primary):
+    """Put the primary database into WAL mode when the WAL read engine is on."""
+    if ENABLED and MODE == "wal":
+        with primary.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+
+def _make_engine(path: str, uri_mode: str, archive_path: str):
+    read_engine = create_engine(
+        f"sqlite:///file:{os.path.abspath(path)}?mode={uri_mode}&uri=true",
+        connect_args={"check_same_thread": False},
+        pool_size=POOL_SIZE,
+        # heavy reads queue for a connection instead of opening more
+        max_overflow=0,
+    )
+    archive.install(read_engine, archive_path)
+
+    @event.listens_for(read_engine, "connect")
+    def query_only(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA query_only=ON")
+
+    return read_engine
+
+
+def _get_sessionmaker() -> sessionmaker:
+    # created lazily so each forked server process gets its own pool
+    global _engine, _sessionmaker
+    with _lock:
+        if _engine is None:
+            # the copy is opened read-write at the file level (`query_only`
+            # still forbids writes) so SQLite never needs a -shm next to it
+            if MODE == "wal":
+                _engine = _make_engine(DB_PATH, "ro", archive.ARCHIVE_DB_PATH)
+            else:
+                _engine = _make_engine(COPY_PATH, "rw", COPY_ARCHIVE_PATH)
+            _sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+        return _sessionmaker
+
+
+def dispose(close: bool = True):
+    with _lock:
+        if _engine is not None:
+            _engine.dispose(close=close)
+
+
+def copy_age() -> Optional[float]:
+    """Seconds since the read copy was taken, or None if there is none yet."""
+    try:
+        return max(0.0, time.time() - os.path.getmtime(COPY_PATH))
+    except OSError:
+        return None
+
+
+def refresh_copy():
+    """Take a fresh read copy of the primary database (and archive) and swap it in.
+
+    Raises RuntimeError if archive moves keep landing between the two copies.
+    """
+    started = time.time()
+    tmp = f"{COPY_PATH}.{os.getpid()}.tmp"
+    tmp_archive = f"{COPY_ARCHIVE_PATH}.{os.getpid()}.tmp"
+    with_archive = archive.ENABLED and os.path.exists(archive.ARCHIVE_DB_PATH)
+    for _ in range(COPY_ATTEMPTS):
+        moves = archive.generation(archive.ARCHIVE_DB_PATH) if with_archive else None
+        backup.copy_database(DB_PATH, tmp, COPY_PAGES, COPY_PAUSE)
+        if not with_archive:
+            break
+        backup.copy_database(archive.ARCHIVE_DB_PATH, tmp_archive, COPY_PAGES, COPY_PAUSE)
+        # a batch archived between the two copies would be in both or neither
+        if archive.generation(tmp_archive) == moves:
+            break
+    else:
+        for path in (tmp, tmp_archive):
+            os.remove(path)
+        raise RuntimeError("The archive kept changing while the read copy was taken")
+    # stamp the copy with when it was started: it is at least that fresh
+    os.utime(tmp, (started, started))
+    # archive first: pooled connections keep the old pair open, and new ones
+    # are only made once the main copy's inode has changed (see _copy_session)
+    if with_archive:
+        os.replace(tmp_archive, COPY_ARCHIVE_PATH)
+    os.replace(tmp, COPY_PATH)
+
+
+def _refresh_in_background():
+    if _refreshing.is_set():
+        return
+    _refreshing.set()
+
+    def run():
+        try:
+            refresh_copy()
+        finally:
+            _refreshing.clear()
+
+    threading.Thread(target=run, name="read-copy-refresh", daemon=True).start()
+
+
+def _copy_session() -> Optional[Session]:
+    global _copy_inode
+    age = copy_age()
+    if age is None or age > MAX_STALENESS / 2:
+        _refresh_in_background()
+    if age is None or age > MAX_STALENESS:
+        return None
+    factory = _get_sessionmaker()
+    inode = os.stat(COPY_PATH).st_ino
+    with _lock:
+        if inode != _copy_inode:
+            # the copy was swapped (here or by another process); pooled
+            # connections still point at the old file
+            _engine.dispose()
+            _copy_inode = inode
+    db = factory()
+    db.info[SERVED_BY] = f"copy; age={age:.1f}s"
+    return db
+
+
+def open_session() -> Session:
+    """A session for heavy reads; ``served_by(db)`` says which engine it uses."""
+    db = None
+    if ENABLED and MODE == "wal":
+        db = _get_sessionmaker()()
+        db.info[SERVED_BY] = "wal"
+    elif ENABLED:
+        db = _copy_session()
+    if db is None:
+        db = SessionLocal()
+        db.info[SERVED_BY] = "primary"
+    return db
+
+
+def served_by(db: Session) -> str:
+    return db.info.get(SERVED_BY, "primary")
+
+
+def get_read_router(response: Response):
+    """Like shards.get_task_router, but over the read-only engine."""
+    db = open_session()
+    response.headers[HEADER] = served_by(db)
+    router = TaskRouter(db)
+    try:
+        yield router
+    finally:
+        router.close()
+        db.close()
@@ -100,10 +100,50 @@ class Task(TaskBase):
     created_at: datetime
     updated_at: datetime
     tags: List[int] = []
+    archived: bool = False
 
     class Config:
         from_attributes = True
 
 
 class TaskTagCreate(BaseModel):
-    member_id: int
\ No newline at end of file
+    member_id: int
+
+
+class InboxSeen(BaseModel):
+    # newest tagged_at the client has shown; defaults to now
+    seen_at: Optional[datetime] = None
+
+
+class ArchiveRequest(BaseModel):
+    older_than_days: int = Field(120, ge=1)
+    batch_size: int = Field(500, ge=1, le=5000)
+
+
+class UnarchiveRequest(BaseModel):
+    task_ids: Optional[List[int]] = None
+    created_from: Optional[date] = None
+    created_to: Optional[date] = None
+
+
+class ReportJobCreate(BaseModel):
+    period: str = Field("weekly", pattern="^(weekly|monthly|semester)$")
+    format: str = Field("xlsx", pattern="^(csv|xlsx)$")
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    member_id: Optional[int] = None
+    status: Optional[str] = None
+
+
+class ReportJob(BaseModel):
+    id: int
+    status: str
+    progress: int
+    format: str
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    download_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,163 @@
+import base64
+import hashlib
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+from sqlalchemy import Float, select, type_coerce
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+# Fast path for task payloads: plain column tuples from SQLAlchemy Core are
+# encoded straight to JSON bytes. Building schemas.Task per row and letting
+# FastAPI validate it again through response_model roughly doubled the work
+# for large lists; the output is byte-for-byte the same shape.
+
+
+class TaskRow(TypedDict):
+    title: str
+    details: Optional[str]
+    hours_spent: Optional[float]
+    due_date: Optional[date]
+    blockers: Optional[str]
+    comments: Optional[str]
+    status: str
+    assignee_id: Optional[int]
+    id: int
+    creator_id: Optional[int]
+    created_at: datetime
+    updated_at: datetime
+    tags: List[int]
+    archived: bool
+
+
+class InboxItem(TaskRow):
+    tagged_at: datetime
+    unread: bool
+
+
+class InboxPage(TypedDict):
+    items: List[InboxItem]
+    next_cursor: Optional[str]
+    unread: int
+
+
+_task_adapter = TypeAdapter(TaskRow)
+_task_list_adapter = TypeAdapter(List[TaskRow])
+_inbox_adapter = TypeAdapter(InboxPage)
+member_list_adapter = TypeAdapter(List[schemas.Member])
+team_list_adapter = TypeAdapter(List[schemas.Team])
+
+# keyset cursors: (timestamp, id) of the last row of a page
+Cursor = Tuple[datetime, int]
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# below SQLite's historical limit of 999 bound parameters; paged lists
+# (limit <= PAGE_MAX) always stay under it
+PAGE_MAX = 500
+BIND_IDS_MAX = 900
+
+tasks_table = models.Task.__table__
+tags_table = models.TaskTag.__table__
+
+
+def encode_cursor(key: Cursor) -> str:
+    at, row_id = key
+    return base64.urlsafe_b64encode(f"{at.isoformat()}|{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Raises ValueError on anything that did not come from encode_cursor."""
+    try:
+        at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(at), int(row_id)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def select_tasks(table=tasks_table):
+    """Core SELECT of the task columns in response order.
+
+    hours_spent is read as a plain float; going through Numeric would build a
+    Decimal per row only to turn it back into a float.
+    """
+    c = table.c
+    return select(
+        c.title,
+        c.details,
+        type_coerce(c.hours_spent, Float).label("hours_spent"),
+        c.due_date,
+        c.blockers,
+        c.comments,
+        c.status,
+        c.assignee_id,
+        c.id,
+        c.creator_id,
+        c.created_at,
+        c.updated_at,
+    )
+
+
+def fetch_tasks(db: Session, stmt, tag_table=tags_table, archived: bool = False) -> List[dict]:
+    rows = [row._asdict() for row in db.execute(stmt)]
+    if not rows:
+        return rows
+    # tags for all rows in one query. A page binds its own ids; a whole list
+    # reuses the task filter as a subquery instead of binding thousands (the
+    # subquery drops ORDER BY, which is only safe when there is no LIMIT)
+    if len(rows) <= BIND_IDS_MAX:
+        ids = [row["id"] for row in rows]
+    else:
+        ids = stmt.with_only_columns(stmt.selected_columns.id).order_by(None)
+    tags = {}
+    for task_id, member_id in db.execute(
+        select(tag_table.c.task_id, tag_table.c.member_id).where(tag_table.c.task_id.in_(ids))
+    ):
+        tags.setdefault(task_id, []).append(member_id)
+    for row in rows:
+        row["tags"] = tags.get(row["id"], [])
+        row["archived"] = archived
+    return rows
+
+
+def tasks_response(rows: List[dict], next_cursor: Optional[str] = None) -> Response:
+    response = Response(content=_task_list_adapter.dump_json(rows), media_type="application/json")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
+
+def orm_json(adapter: TypeAdapter, objects) -> bytes:
+    """ORM objects through a response schema adapter, as JSON bytes."""
+    return adapter.dump_json(adapter.validate_python(objects, from_attributes=True))
+
+
+def etag_response(request: Request, body: bytes) -> Response:
+    """JSON ``body`` with a content-hash ETag; 304 if the client already has it.
+
+    ``no-cache`` makes browsers revalidate every time, which costs one small
+    request instead of re-downloading and re-rendering unchanged lists.
+    """
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    match = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in match or f"W/{etag}" in match or "*" in match:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def inbox_response(page: dict) -> Response:
+    return Response(content=_inbox_adapter.dump_json(page), media_type="application/json")
+
+
+def task_response(db: Session, task_id: int, status_code: int = 200) -> Response:
+    stmt = select_tasks().where(tasks_table.c.id == task_id)
+    row = fetch_tasks(db, stmt)[0]
+    return Response(
+        content=_task_adapter.dump_json(row),
+        media_type="application/json",
+        status_code=status_code,
+    )
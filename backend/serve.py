@@ -0,0 +1,224 @@
+# Multi-process server entry point.
+#
+#     python -m backend.serve --workers 4 [--preload] [--host 0.0.0.0] [--port 8000]
+#
+# Schema creation and seeding run once, under the bootstrap file lock, in a
+# short-lived child process (`python -m backend.bootstrap`), so the supervisor
+# never imports the app's own modules. It then binds the listening socket and
+# forks the workers, which share that socket and each import the app and warm
+# their own connection pool. Signals:
+#
+# - SIGTERM / SIGINT: graceful shutdown of every worker, then exit.
+# - SIGHUP: rolling restart; each worker is replaced by a fresh one that is
+#   already accepting connections before the old one is asked to stop. New
+#   workers load the code as it is on disk now, unless --preload was given
+#   (then the app was imported before forking and needs a full restart). If a
+#   new worker does not become ready, the restart stops there and the
+#   remaining old workers keep serving.
+#
+# On platforms without fork() this falls back to uvicorn's own worker manager
+# (still bootstrapping only once), without preload or rolling restarts.
+import argparse
+import os
+import select
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Optional
+
+import uvicorn
+
+APP = "backend.main:app"
+# bootstrap.SKIP_ENV; not imported from there to keep the app out of this process
+SKIP_ENV = "EFFORT_SKIP_BOOTSTRAP"
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+
+class _Server(uvicorn.Server):
+    """uvicorn server that tells the supervisor once it is accepting requests."""
+
+    def __init__(self, config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if self.started:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+
+
+class Supervisor:
+    def __init__(self, args, sock: socket.socket, app):
+        self.args = args
+        self.sock = sock
+        self.app = app
+        self.workers = {}  # pid -> generation
+        self.generation = 0
+        self.stopping = False
+        self.reload_requested = False
+
+    def spawn(self) -> Optional[int]:
+        """Fork a worker and wait until it accepts requests; None if it never does."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            if self.app is not None:
+                # preloaded: connections opened by the parent must not be shared across fork
+                from . import replica, shards
+                from .db import engine
+
+                engine.dispose(close=False)
+                shards.dispose_all(close=False)
+                replica.dispose(close=False)
+            config = uvicorn.Config(
+                self.app or APP,
+                log_level=self.args.log_level,
+                timeout_graceful_shutdown=self.args.graceful_timeout,
+            )
+            try:
+                _Server(config, write_fd).run(sockets=[self.sock])
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        if not self.wait_ready(read_fd):
+            print(f"[serve] worker {pid} did not become ready", file=sys.stderr)
+            self.kill(pid)
+            return None
+        self.workers[pid] = self.generation
+        return pid
+
+    def wait_ready(self, read_fd: int) -> bool:
+        deadline = time.monotonic() + self.args.graceful_timeout + 30
+        try:
+            remaining = deadline - time.monotonic()
+            # os.read alone would block past the deadline if the worker hangs;
+            # EOF means the worker exited during startup
+            return bool(select.select([read_fd], [], [], max(remaining, 0))[0] and os.read(read_fd, 1))
+        finally:
+            os.close(read_fd)
+
+    def kill(self, pid: int):
+        # a worker that never started has nothing to drain
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+    def stop(self, pid: int):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+        self.workers.pop(pid, None)
+
+    def reap(self):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self.workers.pop(pid, None) is not None and not self.stopping:
+                print(f"[serve] worker {pid} exited, starting a replacement", file=sys.stderr)
+                time.sleep(1)  # don't spin if workers crash on startup
+                while self.spawn() is None and not self.stopping:
+                    time.sleep(1)
+
+    def rolling_restart(self):
+        self.generation += 1
+        old = [pid for pid, gen in self.workers.items() if gen < self.generation]
+        for done, pid in enumerate(old):
+            if self.spawn() is None:
+                # e.g. a broken deploy: keep the old workers serving instead
+                # of replacing every one of them with a crashing one
+                print(
+                    f"[serve] rolling restart aborted after {done} of {len(old)} worker(s): "
+                    "the new worker did not start; the remaining old workers keep running",
+                    file=sys.stderr,
+                )
+                return
+            self.stop(pid)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        for _ in range(self.args.workers):
+            if self.spawn() is None:
+                print("[serve] a worker failed to start, exiting", file=sys.stderr)
+                for pid in list(self.workers):
+                    self.stop(pid)
+                sys.exit(1)
+        print(f"[serve] {len(self.workers)} worker(s) on {self.args.host}:{self.args.port}", file=sys.stderr)
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.rolling_restart()
+            self.reap()
+            time.sleep(0.2)
+        for pid in list(self.workers):
+            self.stop(pid)
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def _on_reload(self, signum, frame):
+        self.reload_requested = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the effort tracker with several worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers", type=int, default=default_workers(), help="default: $WEB_CONCURRENCY or the CPU count"
+    )
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="import the app once in the supervisor so workers fork with it loaded "
+        "(faster start, less memory; code changes then need a full restart)",
+    )
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    done = subprocess.run([sys.executable, "-m", "backend.bootstrap"])
+    if done.returncode:
+        sys.exit(done.returncode)
+    os.environ[SKIP_ENV] = "1"
+
+    if not hasattr(os, "fork"):
+        uvicorn.run(APP, host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+        return
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    app = None
+    if args.preload:
+        from .main import app
+
+    Supervisor(args, sock, app).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import argparse
+import glob
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from fastapi import Depends
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, delete, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import archive, models
+from .db import DATABASE_URL, SessionLocal, engine, get_db
+
+# Optional per-team sharding (SHARD_DIR=<directory>). Each team's tasks and
+# task tags live in their own SQLite file, SHARD_DIR/team_<id>.db, so one busy
+# team's writes no longer serialise everybody else's. Members, teams, session
+# tokens and export jobs stay in the main ("directory") database, which also
+# records in `task_directory` which shard holds each task id. Task ids are
+# allocated there, so they stay unique across shards.
+#
+# A task is stored in the shard of its assignee's team at creation time and
+# stays there; lookups by id always go through the directory. Reads that are
+# not about one task (lists, reports) fan out to every shard in parallel.
+SHARD_DIR = os.getenv("SHARD_DIR", "")
+ENABLED = bool(SHARD_DIR) and DATABASE_URL.startswith("sqlite")
+FAN_OUT_WORKERS = int(os.getenv("SHARD_FAN_OUT_WORKERS", "8"))
+
+# tasks whose team is unknown (no assignee, or assignee without a team)
+UNASSIGNED = 0
+SHARD_TABLES = [models.Task.__table__, models.TaskTag.__table__]
+
+directory_metadata = MetaData()
+
+task_directory = Table(
+    "task_directory",
+    directory_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("team_id", Integer, nullable=False, index=True),
+    # AUTOINCREMENT: ids of deleted/archived tasks are never handed out again
+    sqlite_autoincrement=True,
+)
+
+_engines = {}
+_sessionmakers = {}
+_lock = threading.Lock()
+_pool = None
+
+T = TypeVar("T")
+
+
+def create_all(bind=engine):
+    if ENABLED:
+        directory_metadata.create_all(bind=bind)
+
+
+def shard_path(team_id: Optional[int]) -> str:
+    return os.path.join(SHARD_DIR, f"team_{team_id or UNASSIGNED}.db")
+
+
+def shard_team_ids() -> List[int]:
+    """Teams that currently have a shard file."""
+    ids = []
+    for path in glob.glob(os.path.join(SHARD_DIR, "team_*.db")):
+        match = re.fullmatch(r"team_(\d+)\.db", os.path.basename(path))
+        if match:
+            ids.append(int(match.group(1)))
+    return sorted(ids)
+
+
+def engine_for(team_id: Optional[int]):
+    team_id = team_id or UNASSIGNED
+    with _lock:
+        shard_engine = _engines.get(team_id)
+        if shard_engine is None:
+            os.makedirs(SHARD_DIR, exist_ok=True)
+            path = shard_path(team_id)
+            shard_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+            archive.install(shard_engine, archive.path_for(path))
+            models.Base.metadata.create_all(bind=shard_engine, tables=SHARD_TABLES)
+            models.ensure_indexes(shard_engine, SHARD_TABLES)
+            archive.create_all(bind=shard_engine)
+            _engines[team_id] = shard_engine
+            _sessionmakers[team_id] = sessionmaker(autocommit=False, autoflush=False, bind=shard_engine)
+        return shard_engine
+
+
+def session_for(team_id: Optional[int]) -> Session:
+    engine_for(team_id)
+    return _sessionmakers[team_id or UNASSIGNED]()
+
+
+def dispose_all(close: bool = True):
+    with _lock:
+        for shard_engine in _engines.values():
+            shard_engine.dispose(close=close)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix="shard")
+        return _pool
+
+
+def team_of_member(db: Session, member_id: Optional[int]) -> int:
+    if not member_id:
+        return UNASSIGNED
+    return db.query(models.Member.team_id).filter(models.Member.id == member_id).scalar() or UNASSIGNED
+
+
+def team_of_task(db: Session, task_id: int) -> Optional[int]:
+    return db.execute(select(task_directory.c.team_id).where(task_directory.c.id == task_id)).scalar()
+
+
+class TaskRouter:
+    """Picks the session that holds a task, a member's new tasks, or all tasks.
+
+    Without SHARD_DIR every method hands back the request's own session, so
+    endpoints use the same code either way.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._sessions: Dict[int, Session] = {}
+
+    def for_team(self, team_id: Optional[int]) -> Session:
+        if not ENABLED:
+            return self.db
+        team_id = team_id or UNASSIGNED
+        if team_id not in self._sessions:
+            self._sessions[team_id] = session_for(team_id)
+        return self._sessions[team_id]
+
+    def for_task(self, task_id: int) -> Optional[Session]:
+        """Session of the shard holding ``task_id``, or None if no shard has it."""
+        if not ENABLED:
+            return self.db
+        team_id = team_of_task(self.db, task_id)
+        return None if team_id is None else self.for_team(team_id)
+
+    def for_new_task(self, assignee_id: Optional[int]) -> Tuple[Session, Optional[int]]:
+        """Session and pre-allocated id for a task assigned to ``assignee_id``.
+
+        The id is None when unsharded (the tasks table assigns it).
+        """
+        if not ENABLED:
+            return self.db, None
+        team_id = team_of_member(self.db, assignee_id)
+        # committed straight away so the main database is not held locked
+        # during the shard write; release() undoes it if that write fails
+        task_id = self.db.execute(insert(task_directory).values(team_id=team_id)).inserted_primary_key[0]
+        self.db.commit()
+        return self.for_team(team_id), task_id
+
+    def release(self, task_id: Optional[int]):
+        """Drop the directory entry of an id from for_new_task whose task was never written."""
+        if not ENABLED or task_id is None:
+            return
+        self.db.execute(delete(task_directory).where(task_directory.c.id == task_id))
+        self.db.commit()
+
+    def fan_out(self, fn: Callable[[Session], T]) -> List[T]:
+        """Run ``fn`` against every shard in parallel, one session per shard."""
+        if not ENABLED:
+            return [fn(self.db)]
+
+        def run(team_id: int) -> T:
+            with session_for(team_id) as db:
+                return fn(db)
+
+        return list(_executor().map(run, shard_team_ids()))
+
+    def close(self):
+        for db in self._sessions.values():
+            db.close()
+        self._sessions.clear()
+
+
+def get_task_router(db: Session = Depends(get_db)):
+    router = TaskRouter(db)
+    try:
+        yield router
+    finally:
+        router.close()
+
+
+def split(batch_size: int = 1000, delete_source: bool = False) -> Dict[int, int]:
+    """Copy tasks and tags from the main database into per-team shard files.
+
+    Each task goes to its assignee's team (falling back to the creator's).
+    Safe to re-run: rows already present in a shard are skipped. Returns the
+    number of tasks handled per team.
+    """
+    tasks = models.Task.__table__
+    tags = models.TaskTag.__table__
+    models.Base.metadata.create_all(bind=engine)
+    directory_metadata.create_all(bind=engine)
+    copied: Dict[int, int] = {}
+    with SessionLocal() as db:
+        member_teams = dict(db.query(models.Member.id, models.Member.team_id).all())
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(tasks).where(tasks.c.id > last_id).order_by(tasks.c.id).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            by_team: Dict[int, List[dict]] = {}
+            for row in rows:
+                team_id = member_teams.get(row["assignee_id"]) or member_teams.get(row["creator_id"]) or UNASSIGNED
+                by_team.setdefault(team_id, []).append(dict(row))
+            for team_id, team_rows in by_team.items():
+                ids = [row["id"] for row in team_rows]
+                tag_rows = [dict(r) for r in db.execute(select(tags).where(tags.c.task_id.in_(ids))).mappings()]
+                with engine_for(team_id).begin() as conn:
+                    conn.execute(insert(tasks).prefix_with("OR IGNORE"), team_rows)
+                    if tag_rows:
+                        conn.execute(insert(tags).prefix_with("OR IGNORE"), tag_rows)
+                db.execute(
+                    insert(task_directory).prefix_with("OR IGNORE"),
+                    [{"id": task_id, "team_id": team_id} for task_id in ids],
+                )
+                copied[team_id] = copied.get(team_id, 0) + len(ids)
+            db.commit()
+        if delete_source:
+            db.execute(delete(tags))
+            db.execute(delete(tasks))
+            db.commit()
+    return copied
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage per-team task shards")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sp = sub.add_parser(
+        "split",
+        help="copy tasks from the main database into SHARD_DIR "
+        "(un-archive first; archived tasks are not moved)",
+    )
+    sp.add_argument("--batch-size", type=int, default=1000)
+    sp.add_argument("--delete-source", action="store_true", help="remove the copied rows from the main database")
+    args = parser.parse_args(argv)
+
+    if not ENABLED:
+        parser.error("set SHARD_DIR (and use a SQLite DATABASE_URL) first")
+    copied = split(args.batch_size, args.delete_source)
+    for team_id, count in sorted(copied.items()):
+        print(f"team {team_id}: {count} task(s) -> {shard_path(team_id)}")
+
+
+if __name__ == "__main__":
+    main()
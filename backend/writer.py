@@ -0,0 +1,190 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+# Optional single-writer path (WRITE_QUEUE=1). SQLite allows one writer at a
+# time, so instead of every request thread committing on its own and fighting
+# over the database lock, mutations are handed to one thread that applies
+# whatever arrives within a few milliseconds as a single transaction (group
+# commit: one lock acquisition and one fsync for the whole batch). Each
+# mutation runs in its own SAVEPOINT so one failing caller does not sink the
+# others in its batch.
+ENABLED = os.getenv("WRITE_QUEUE", "0") == "1"
+BATCH_WINDOW = float(os.getenv("WRITE_BATCH_WINDOW_MS", "5")) / 1000
+MAX_BATCH = int(os.getenv("WRITE_MAX_BATCH", "64"))
+QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", "1000"))
+# how long a caller waits for room in a full queue before giving up
+SUBMIT_TIMEOUT = float(os.getenv("WRITE_SUBMIT_TIMEOUT", "2"))
+# how long a caller waits for its queued write to be applied
+RESULT_TIMEOUT = float(os.getenv("WRITE_RESULT_TIMEOUT", "30"))
+
+_STOP = object()
+
+
+class QueueFull(Exception):
+    pass
+
+
+class WriteTimeout(Exception):
+    """The write was queued but not applied within RESULT_TIMEOUT; it may still be."""
+
+
+class BatchFailed(Exception):
+    """The batch could not be started or committed (e.g. "database is locked")."""
+
+
+class WriteQueue:
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        # callers currently blocked in submit(); once all of them are in the
+        # batch there is nothing left to wait for
+        self._pending = 0
+
+    def _ensure_started(self):
+        # started lazily so each forked server process runs its own writer
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn: Callable[[Session], Any]) -> Any:
+        """Run ``fn(session)`` on the writer thread and return its result.
+
+        Exceptions raised by ``fn`` are re-raised in the caller; a batch that
+        cannot be opened or committed raises BatchFailed. Raises QueueFull when
+        the queue stays full for SUBMIT_TIMEOUT seconds and WriteTimeout when
+        the write is not applied within RESULT_TIMEOUT.
+        """
+        self._ensure_started()
+        future = Future()
+        with self._lock:
+            self._pending += 1
+        try:
+            try:
+                self._queue.put((fn, future), timeout=SUBMIT_TIMEOUT)
+            except queue.Full:
+                raise QueueFull()
+            try:
+                return future.result(timeout=RESULT_TIMEOUT)
+            except FutureTimeout:
+                raise WriteTimeout()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stop(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(_STOP)
+                self._thread.join()
+            self._thread = None
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + BATCH_WINDOW
+            while len(batch) < MAX_BATCH:
+                # take whatever is already queued; only wait out the window
+                # while other callers could still be about to submit
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or len(batch) >= self._pending:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if item is _STOP:
+                    self._apply(batch)
+                    return
+                batch.append(item)
+            self._apply(batch)
+
+    def _apply(self, batch):
+        try:
+            outcomes = self._run_batch(batch)
+        except Exception as e:
+            # connecting, BEGIN or the rollback failed: nothing was applied.
+            # Every caller must hear about it, and the writer thread lives on.
+            failure = BatchFailed(str(e))
+            failure.__cause__ = e
+            outcomes = [(future, None, failure) for _, future in batch]
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _run_batch(self, batch):
+        outcomes = []
+        with self.session_factory() as db:
+            conn = db.connection()
+            if conn.dialect.name == "sqlite":
+                # pysqlite only BEGINs before DML, and a SAVEPOINT opened outside
+                # a transaction commits on RELEASE; open the batch explicitly
+                # (IMMEDIATE: take the write lock once, up front)
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                savepoint = db.begin_nested()
+                try:
+                    result = fn(db)
+                    db.flush()
+                    savepoint.commit()
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    savepoint.rollback()
+                    outcomes.append((future, None, e))
+            try:
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                failure = BatchFailed(str(e))
+                failure.__cause__ = e
+                outcomes = [(future, None, err or failure) for future, _, err in outcomes]
+        return outcomes
+
+
+# one writer per database (the main one, or each team shard)
+_queues = {}
+_engines = {}
+_queues_lock = threading.Lock()
+
+
+def _own_engine(bind):
+    # Request threads keep their pooled connection while they wait in submit(),
+    # so a writer sharing their pool could wait for one of them forever (until
+    # the pool timeout). It gets a pool of its own instead; recreate() keeps
+    # the connect arguments and "connect" listeners such as the archive ATTACH.
+    return create_engine(bind.url, pool=bind.pool.recreate())
+
+
+def queue_for(bind) -> WriteQueue:
+    with _queues_lock:
+        if bind not in _queues:
+            _engines[bind] = _own_engine(bind)
+            _queues[bind] = WriteQueue(sessionmaker(autocommit=False, autoflush=False, bind=_engines[bind]))
+        return _queues[bind]
+
+
+def stop_all():
+    with _queues_lock:
+        queues = list(_queues.values())
+        engines = list(_engines.values())
+    for q in queues:
+        q.stop()
+    for own in engines:
+        own.dispose()
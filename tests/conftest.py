@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# backend.db reads DATABASE_URL at import time; never let tests touch a real database
+_tmp = tempfile.mkdtemp(prefix="effort-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'effort.db')}"
+os.environ["BOOTSTRAP_LOCK_PATH"] = os.path.join(_tmp, ".bootstrap.lock")
+os.environ["EXPORT_DIR"] = os.path.join(_tmp, "exports")
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from backend.db import engine
+from backend.main import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def login(client, username="alex.lead"):
+    token = client.post("/api/auth/login", json={"username": username, "password": "changeme"}).json()
+    return {"Authorization": f"Bearer {token['access_token']}"}
+
+
+def test_concurrent_edits_adding_the_same_tag(client):
+    headers = login(client)
+    task_id = client.post("/api/tasks", json={"title": "shared", "assignee_id": 2, "tags": [3]}, headers=headers).json()["id"]
+
+    # hold both edits right after they read the task's current tags, so each
+    # decides to insert the same new tag
+    both_read = threading.Barrier(2)
+    reads = []
+
+    def pause_after_tag_read(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT task_tags.member_id") and len(reads) < 2:
+            reads.append(statement)
+            try:
+                both_read.wait(2)
+            except threading.BrokenBarrierError:
+                pass
+
+    event.listen(engine, "after_cursor_execute", pause_after_tag_read)
+    codes = []
+    try:
+        threads = [
+            threading.Thread(
+                target=lambda: codes.append(
+                    client.put(f"/api/tasks/{task_id}", json={"tags": [1, 3]}, headers=headers).status_code
+                )
+            )
+            for _ in range(2)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        event.remove(engine, "after_cursor_execute", pause_after_tag_read)
+
+    assert len(reads) == 2
+    assert codes == [200, 200]
+    tasks = client.get("/api/tasks", params={"member_id": 2}, headers=headers).json()
+    assert sorted(next(t["tags"] for t in tasks if t["id"] == task_id)) == [1, 3]
@@ -0,0 +1,97 @@
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from backend import writer
+
+
+@pytest.fixture
+def queue(tmp_path):
+    path = tmp_path / "w.db"
+    # short busy timeout so a held lock fails the batch quickly
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 0.2, "check_same_thread": False})
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (v INTEGER)"))
+    q = writer.WriteQueue(sessionmaker(bind=engine))
+    yield q, path
+    q.stop()
+    engine.dispose()
+
+
+def insert(value):
+    return lambda db: db.execute(text("INSERT INTO t VALUES (:v)"), {"v": value}).rowcount
+
+
+def test_locked_database_fails_the_batch_and_the_writer_survives(queue):
+    q, path = queue
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(writer.BatchFailed, match="locked"):
+            q.submit(insert(1))
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+    assert q.submit(insert(2)) == 1
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT v FROM t").fetchall() == [(2,)]
+
+
+def test_caller_gives_up_after_result_timeout(queue, monkeypatch):
+    q, _ = queue
+    monkeypatch.setattr(writer, "RESULT_TIMEOUT", 0.1)
+    release = threading.Event()
+
+    def slow(db):
+        release.wait(5)
+
+    try:
+        with pytest.raises(writer.WriteTimeout):
+            q.submit(slow)
+    finally:
+        release.set()
+    assert q.submit(insert(3)) == 1
+
+
+def test_more_submitters_than_pooled_connections(tmp_path, monkeypatch):
+    # each submitter holds a connection from the shared pool while it waits,
+    # like a request thread does; the writer must not need one of those
+    monkeypatch.setattr(writer, "_queues", {})
+    monkeypatch.setattr(writer, "_engines", {})
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'w.db'}",
+        connect_args={"check_same_thread": False},
+        pool_size=4,
+        max_overflow=0,
+        pool_timeout=2,
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (v INTEGER)"))
+    q = writer.queue_for(engine)
+    start = threading.Barrier(4)
+    results, errors = [], []
+
+    def submitter(value):
+        try:
+            with engine.connect() as held:
+                held.execute(text("SELECT 1"))
+                start.wait(5)
+                results.append(q.submit(insert(value)))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=submitter, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    writer.stop_all()
+    assert errors == []
+    assert results == [1] * 4
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 4
+    engine.dispose()